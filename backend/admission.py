@@ -0,0 +1,350 @@
+import os
+import math
+import time
+import uuid
+import asyncio
+import sqlite3
+import tempfile
+import threading
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+
+from metrics import metrics_registry
+
+load_dotenv()
+
+# Lease of the request being served, so upstream calls made for it can be charged
+current_lease = ContextVar("current_lease", default=None)
+
+class Limits:
+    """Admission limits for one resource class.
+
+    With charge_upstream, admission only checks that the bucket could cover
+    the request's cost; tokens are then taken per upstream call through
+    Lease.charge(), so cached and coalesced answers cost nothing.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, user_concurrency: int, concurrency: int,
+                 charge_upstream: bool = False):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.user_concurrency = user_concurrency
+        self.concurrency = concurrency
+        self.charge_upstream = charge_upstream
+
+    @classmethod
+    def from_env(cls, resource: str, rate_per_minute: float, burst: int, user_concurrency: int, concurrency: int,
+                 charge_upstream: bool = False):
+        prefix = f"ADMISSION_{resource.upper()}_"
+        return cls(
+            float(os.getenv(prefix + "RATE_PER_MINUTE", str(rate_per_minute))),
+            int(os.getenv(prefix + "BURST", str(burst))),
+            int(os.getenv(prefix + "USER_CONCURRENCY", str(user_concurrency))),
+            int(os.getenv(prefix + "CONCURRENCY", str(concurrency))),
+            charge_upstream
+        )
+
+class AdmissionDenied(Exception):
+    def __init__(self, resource: str, reason: str, retry_after: float):
+        super().__init__(f"Too many {resource} requests ({reason}), retry in {math.ceil(retry_after)}s")
+        self.resource = resource
+        self.reason = reason
+        self.retry_after = retry_after
+
+def refill(tokens: float, updated: float, now: float, limits: Limits) -> float:
+    return min(limits.burst, tokens + max(0.0, now - updated) * limits.rate)
+
+class MemoryAdmissionStore:
+    """Token buckets and concurrency leases for a single worker process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._leases = {}
+
+    def try_admit(self, resource: str, subject: str, cost: float, limits: Limits, lease_seconds: float):
+        """Return (lease_id, None) or (None, (reason, retry_after)), all under one lock"""
+        now = time.time()
+        with self._lock:
+            self._leases = {lease_id: lease for lease_id, lease in self._leases.items() if lease[2] > now}
+            active = [lease for lease in self._leases.values() if lease[0] == resource]
+            if len(active) >= limits.concurrency:
+                return None, ("concurrency", None)
+            if sum(1 for lease in active if lease[1] == subject) >= limits.user_concurrency:
+                return None, ("user_concurrency", None)
+
+            tokens, updated = self._buckets.get((resource, subject), (limits.burst, now))
+            tokens = refill(tokens, updated, now, limits)
+            if tokens < cost:
+                self._buckets[(resource, subject)] = (tokens, now)
+                return None, ("rate", (cost - tokens) / limits.rate)
+            self._buckets[(resource, subject)] = (tokens if limits.charge_upstream else tokens - cost, now)
+            if len(self._buckets) > 10000:
+                self._prune_buckets(resource, now, limits)
+
+            lease_id = uuid.uuid4().hex
+            self._leases[lease_id] = (resource, subject, now + lease_seconds)
+            return lease_id, None
+
+    def _prune_buckets(self, resource: str, now: float, limits: Limits):
+        # A bucket that has refilled completely is the same as no bucket
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if key[0] != resource or refill(bucket[0], bucket[1], now, limits) < limits.burst
+        }
+
+    def charge(self, resource: str, subject: str, cost: float, limits: Limits):
+        """Take cost tokens after admission; the bucket may go negative, delaying the next request"""
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get((resource, subject), (limits.burst, now))
+            self._buckets[(resource, subject)] = (refill(tokens, updated, now, limits) - cost, now)
+
+    def release(self, lease_id: str):
+        with self._lock:
+            self._leases.pop(lease_id, None)
+
+class SQLiteAdmissionStore:
+    """Token buckets and leases in a SQLite file shared by every worker on the host.
+
+    Each admission runs in one BEGIN IMMEDIATE transaction, so workers see
+    a consistent bucket and lease count. Leases expire so a crashed worker
+    cannot hold slots forever.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS admission_buckets ("
+            "resource TEXT, subject TEXT, tokens REAL, updated REAL, PRIMARY KEY (resource, subject))"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS admission_leases ("
+            "id TEXT PRIMARY KEY, resource TEXT, subject TEXT, expires_at REAL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_admission_leases_resource ON admission_leases (resource, subject)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def try_admit(self, resource: str, subject: str, cost: float, limits: Limits, lease_seconds: float):
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM admission_leases WHERE expires_at <= ?", (now,))
+            active, mine = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(subject = ?), 0) FROM admission_leases WHERE resource = ?",
+                (subject, resource)
+            ).fetchone()
+            if active >= limits.concurrency:
+                connection.execute("COMMIT")
+                return None, ("concurrency", None)
+            if mine >= limits.user_concurrency:
+                connection.execute("COMMIT")
+                return None, ("user_concurrency", None)
+
+            row = connection.execute(
+                "SELECT tokens, updated FROM admission_buckets WHERE resource = ? AND subject = ?",
+                (resource, subject)
+            ).fetchone()
+            tokens = refill(*row, now, limits) if row else limits.burst
+            admitted = tokens >= cost
+            connection.execute(
+                "INSERT OR REPLACE INTO admission_buckets (resource, subject, tokens, updated) VALUES (?, ?, ?, ?)",
+                (resource, subject, tokens - cost if admitted and not limits.charge_upstream else tokens, now)
+            )
+            lease_id = None
+            if admitted:
+                lease_id = uuid.uuid4().hex
+                connection.execute(
+                    "INSERT INTO admission_leases (id, resource, subject, expires_at) VALUES (?, ?, ?, ?)",
+                    (lease_id, resource, subject, now + lease_seconds)
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        if not admitted:
+            return None, ("rate", (cost - tokens) / limits.rate)
+        return lease_id, None
+
+    def charge(self, resource: str, subject: str, cost: float, limits: Limits):
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated FROM admission_buckets WHERE resource = ? AND subject = ?",
+                (resource, subject)
+            ).fetchone()
+            tokens = refill(*row, now, limits) if row else limits.burst
+            connection.execute(
+                "INSERT OR REPLACE INTO admission_buckets (resource, subject, tokens, updated) VALUES (?, ?, ?, ?)",
+                (resource, subject, tokens - cost, now)
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def release(self, lease_id: str):
+        self._connection().execute("DELETE FROM admission_leases WHERE id = ?", (lease_id,))
+
+class Lease:
+    """A held admission slot; release() is idempotent"""
+
+    def __init__(self, controller, lease_id: str, resource: str = None, subject: str = None):
+        self._controller = controller
+        self._lease_id = lease_id
+        self.resource = resource
+        self.subject = subject
+        self._lock = threading.Lock()
+
+    def charge(self, cost: float = 1):
+        """Take tokens for one upstream call made for this request; blocks in SQLite mode"""
+        if self._lease_id is not None and self._controller.limits[self.resource].charge_upstream:
+            self._controller.charge(self.resource, self.subject, cost)
+
+    def release(self):
+        # Streams release from their generator and from a background task
+        with self._lock:
+            lease_id, self._lease_id = self._lease_id, None
+        if lease_id is not None:
+            self._controller.store.release(lease_id)
+
+class AdmissionController:
+    """Per-user rate limits and per-user/global concurrency caps for expensive endpoints.
+
+    Each resource class has a token bucket per subject (a user id, or the
+    client address for anonymous endpoints) plus a cap on leases held at
+    once by that subject and by everyone. A request's cost is drawn from
+    its bucket (at admission, or per upstream call for charge_upstream
+    classes), while it holds a single lease however many upstream calls
+    it makes.
+    """
+
+    def __init__(self, store, limits: dict, lease_seconds: float, busy_retry_seconds: float,
+                 enabled: bool = True):
+        self.store = store
+        self.limits = limits
+        self.lease_seconds = lease_seconds
+        self.busy_retry_seconds = busy_retry_seconds
+        self.enabled = enabled
+        # SQLite admissions can wait on another worker's transaction
+        self._blocking = isinstance(store, SQLiteAdmissionStore)
+        self._lock = threading.Lock()
+        self._admitted = {resource: 0 for resource in limits}
+        self._charged = {resource: 0 for resource in limits}
+        self._denied = {resource: {"rate": 0, "user_concurrency": 0, "concurrency": 0} for resource in limits}
+
+    def admit(self, resource: str, subject, cost: float = 1) -> Lease:
+        """Take a lease for subject (and cost tokens, unless charged upstream), or raise AdmissionDenied"""
+        if not self.enabled:
+            return Lease(self, None)
+        limits = self.limits[resource]
+        cost = min(cost, limits.burst)
+        subject = str(subject)
+        lease_id, denied = self.store.try_admit(resource, subject, cost, limits, self.lease_seconds)
+        with self._lock:
+            if denied is None:
+                self._admitted[resource] += 1
+            else:
+                self._denied[resource][denied[0]] += 1
+        if denied is not None:
+            reason, retry_after = denied
+            raise AdmissionDenied(resource, reason, retry_after if retry_after is not None else self.busy_retry_seconds)
+        return Lease(self, lease_id, resource, subject)
+
+    def charge(self, resource: str, subject: str, cost: float = 1):
+        self.store.charge(resource, subject, cost, self.limits[resource])
+        with self._lock:
+            self._charged[resource] += cost
+
+    def upstream_charger(self):
+        """Charge callback for the request being served, or None outside one"""
+        lease = current_lease.get()
+        return lease.charge if lease is not None else None
+
+    async def charge_current(self, cost: float = 1):
+        """Charge the request being served for one upstream call"""
+        lease = current_lease.get()
+        if lease is None:
+            return
+        if self._blocking:
+            await asyncio.to_thread(lease.charge, cost)
+        else:
+            lease.charge(cost)
+
+    async def acquire(self, resource: str, subject, cost: float = 1) -> Lease:
+        if self._blocking and self.enabled:
+            return await asyncio.to_thread(self.admit, resource, subject, cost)
+        return self.admit(resource, subject, cost)
+
+    async def release(self, lease: Lease):
+        if self._blocking:
+            await asyncio.to_thread(lease.release)
+        else:
+            lease.release()
+
+    @asynccontextmanager
+    async def slot(self, resource: str, subject, cost: float = 1):
+        """Hold a lease for the body of an async with block, charging upstream calls made inside it"""
+        lease = await self.acquire(resource, subject, cost)
+        token = current_lease.set(lease)
+        try:
+            yield lease
+        finally:
+            current_lease.reset(token)
+            await self.release(lease)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "backend": "sqlite" if self._blocking else "memory",
+                "admitted": dict(self._admitted),
+                "charged_tokens": dict(self._charged),
+                "denied": {resource: dict(reasons) for resource, reasons in self._denied.items()}
+            }
+
+def create_store():
+    if os.getenv("ADMISSION_BACKEND", "memory").lower() == "sqlite":
+        return SQLiteAdmissionStore(
+            os.getenv("ADMISSION_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "sdlc_admission.db"))
+        )
+    return MemoryAdmissionStore()
+
+admission = AdmissionController(
+    create_store(),
+    # Default limits per user. LLM and voice tokens are spent only on calls
+    # that reach Granite or Gemini, one per generation: cached, refused and
+    # coalesced answers are free, and requirements-to-code needs 3 tokens in
+    # the bucket but spends only the stages it actually generates. A burst
+    # of 20 covers a busy session, refilling at 20 (voice 30) a minute.
+    # Grading pays one token per run up front. Each user may hold two
+    # requests per class at once.
+    limits={
+        "llm": Limits.from_env("llm", rate_per_minute=20, burst=20, user_concurrency=2, concurrency=32,
+                               charge_upstream=True),
+        "voice": Limits.from_env("voice", rate_per_minute=30, burst=20, user_concurrency=2, concurrency=32,
+                                 charge_upstream=True),
+        "grading": Limits.from_env("grading", rate_per_minute=30, burst=10, user_concurrency=2, concurrency=16)
+    },
+    # Leases outlive the longest request; expiry only matters if a worker dies holding one
+    lease_seconds=float(os.getenv("ADMISSION_LEASE_SECONDS", "600")),
+    busy_retry_seconds=float(os.getenv("ADMISSION_BUSY_RETRY_SECONDS", "2")),
+    enabled=os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+)
+metrics_registry.register("admission", admission.stats)
@@ -1,22 +1,43 @@
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 import os
 from dotenv import load_dotenv
 from database import get_db
 from models import User
+from metrics import Histogram, metrics_registry
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# Trust the token's uid claim instead of looking the user up at all
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "false").lower() == "true"
+ADMIN_USERNAMES = frozenset(
+    name.strip() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip()
+)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Hashes at any other cost are flagged for rehashing on the next login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def verify_password(plain_password, hashed_password):
@@ -25,6 +46,72 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool so hashing never blocks the event loop.
+
+    bcrypt releases the GIL while it works, so max_concurrency threads can
+    hash in parallel; further requests wait their turn in the pool's queue.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._rehashed = 0
+        self.hash_time = Histogram()
+        self.login_time = Histogram()
+
+    async def _run(self, func, *args):
+        with self._lock:
+            self._waiting += 1
+
+        def timed():
+            with self._lock:
+                self._waiting -= 1
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.hash_time.observe((time.perf_counter() - started) * 1000)
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str):
+        """Return (valid, new_hash); new_hash is set when the stored hash should be replaced"""
+        valid, new_hash = await self._run(pwd_context.verify_and_update, password, hashed_password)
+        if new_hash:
+            with self._lock:
+                self._rehashed += 1
+        return valid, new_hash
+
+    def observe_login(self, elapsed_ms: float):
+        self.login_time.observe(elapsed_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            waiting = self._waiting
+            rehashed = self._rehashed
+        return {
+            "rounds": BCRYPT_ROUNDS,
+            "max_concurrency": self.max_concurrency,
+            "waiting": waiting,
+            "rehashed": rehashed,
+            "hash_time": self.hash_time.snapshot(),
+            "login_time": self.login_time.snapshot()
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHasher(
+    max_concurrency=int(os.getenv("BCRYPT_MAX_CONCURRENCY", str(os.cpu_count() or 2)))
+)
+metrics_registry.register("passwords", password_hasher.stats)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -35,7 +122,88 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class Principal:
+    """The authenticated user as seen by request handlers"""
+
+    __slots__ = ("id", "username", "email")
+
+    def __init__(self, id: int, username: str, email: Optional[str] = None):
+        self.id = id
+        self.username = username
+        self.email = email
+
+class PrincipalCache:
+    """Short-lived principals keyed by token subject, so requests skip the user query"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stateless = 0
+
+    def get(self, subject: str) -> Optional[Principal]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or entry[1] < time.monotonic():
+                self._misses += 1
+                return None
+            self._entries.move_to_end(subject)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, principal: Principal):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[principal.username] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(principal.username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str):
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def count_stateless(self):
+        with self._lock:
+            self._stateless += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "stateless": AUTH_STATELESS,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "stateless_hits": self._stateless
+            }
+
+principal_cache = PrincipalCache(
+    ttl_seconds=float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60")),
+    max_entries=int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+)
+metrics_registry.register("auth", principal_cache.stats)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, user):
+    principal_cache.invalidate(user.username)
+    # A rename leaves the old subject cached too
+    for username in inspect(user).attrs.username.history.deleted or ():
+        principal_cache.invalidate(username)
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return user_from_token(token, db)
+
+def user_from_token(token: str, db: Session) -> Principal:
+    """Resolve a bearer token to its Principal, raising 401 if it is invalid"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -49,7 +217,23 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
     
+    if AUTH_STATELESS and payload.get("uid") is not None:
+        principal_cache.count_stateless()
+        return Principal(payload["uid"], username)
+    
+    principal = principal_cache.get(username)
+    if principal is not None:
+        return principal
+    
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    principal = Principal(user.id, user.username, user.email)
+    principal_cache.put(principal)
+    return principal
+
+def get_current_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
+    """Allow only users listed in ADMIN_USERNAMES"""
+    if current_user.username not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
@@ -3,10 +3,15 @@ import tempfile
 import os
 import json
 
+from sandbox_pool import sandbox_pool
+from java_runner import java_runner
+
 class CodeExecutor:
     @staticmethod
     def execute_python(code: str, test_input: str = "") -> dict:
         """Execute Python code safely"""
+        if sandbox_pool.enabled:
+            return CodeExecutor.execute_python_pooled(code, test_input)
         try:
             with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
                 f.write(code)
@@ -43,70 +48,61 @@ class CodeExecutor:
             }
     
     @staticmethod
-    def execute_java(code: str, test_input: str = "") -> dict:
-        """Execute Java code safely"""
+    def execute_python_pooled(code: str, test_input: str = "") -> dict:
+        """Execute Python code in a warm sandbox worker"""
         try:
-            # Extract class name from code
-            import re
-            class_match = re.search(r'public\s+class\s+(\w+)', code)
-            if not class_match:
-                return {
-                    "success": False,
-                    "output": "",
-                    "error": "Could not find public class declaration"
-                }
-            
-            class_name = class_match.group(1)
-            
-            # Create temporary directory
-            with tempfile.TemporaryDirectory() as temp_dir:
-                java_file = os.path.join(temp_dir, f"{class_name}.java")
-                
-                with open(java_file, 'w') as f:
-                    f.write(code)
-                
-                # Compile
-                compile_result = subprocess.run(
-                    ['javac', java_file],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
-                
-                if compile_result.returncode != 0:
-                    return {
-                        "success": False,
-                        "output": "",
-                        "error": f"Compilation error: {compile_result.stderr}"
-                    }
-                
-                # Execute
-                run_result = subprocess.run(
-                    ['java', '-cp', temp_dir, class_name],
-                    input=test_input,
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                
-                return {
-                    "success": run_result.returncode == 0,
-                    "output": run_result.stdout,
-                    "error": run_result.stderr
-                }
-                
-        except subprocess.TimeoutExpired:
+            result = sandbox_pool.execute(code, test_input, timeout=5)
+        except Exception as e:
             return {
                 "success": False,
                 "output": "",
-                "error": "Execution timed out"
+                "error": f"Sandbox error: {e}"
             }
+        
+        return CodeExecutor._sandbox_result(result)
+    
+    @staticmethod
+    def execute_python_batch(code: str, test_inputs: list, keep_going=None) -> list:
+        """Execute Python code against many inputs in one sandbox worker, compiling it once"""
+        def translate_and_check(result):
+            return keep_going(CodeExecutor._sandbox_result(result))
+        
+        try:
+            results = sandbox_pool.run_batch(
+                code, test_inputs, timeout=5,
+                keep_going=translate_and_check if keep_going else None
+            )
         except Exception as e:
+            return [{
+                "success": False,
+                "output": "",
+                "error": f"Sandbox error: {e}"
+            } for _ in test_inputs]
+        return [CodeExecutor._sandbox_result(result) for result in results]
+    
+    @staticmethod
+    def _sandbox_result(result: dict) -> dict:
+        if result.get("timed_out"):
             return {
                 "success": False,
                 "output": "",
-                "error": str(e)
+                "error": "Execution timed out (5 seconds limit)",
+                "wall_ms": result.get("wall_ms"),
+                "cpu_ms": result.get("cpu_ms")
             }
+        
+        return {
+            "success": result["success"],
+            "output": result["output"],
+            "error": result["error"],
+            "wall_ms": result.get("wall_ms"),
+            "cpu_ms": result.get("cpu_ms")
+        }
+    
+    @staticmethod
+    def execute_java(code: str, test_input: str = "") -> dict:
+        """Execute Java code safely"""
+        return java_runner.run_all(code, [test_input])[0]
     
     @staticmethod
     def execute_code(code: str, language: str, test_input: str = "") -> dict:
@@ -121,5 +117,21 @@ class CodeExecutor:
                 "output": "",
                 "error": f"Unsupported language: {language}"
             }
+    
+    @staticmethod
+    def run_submission(code: str, language: str, test_inputs: list, keep_going=None) -> list:
+        """Execute one submission against every test input, returning a result per input"""
+        if language.lower() == "java":
+            # Compile once and run all inputs against the same classes
+            return java_runner.run_all(code, test_inputs, keep_going=keep_going)
+        if language.lower() == "python" and sandbox_pool.enabled:
+            # Compile once and fork each input from the same sandbox worker
+            return CodeExecutor.execute_python_batch(code, test_inputs, keep_going)
+        results = []
+        for test_input in test_inputs:
+            results.append(CodeExecutor.execute_code(code, language, test_input))
+            if keep_going is not None and not keep_going(results[-1]):
+                break
+        return results
 
 code_executor = CodeExecutor()
\ No newline at end of file
@@ -1,16 +1,139 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
+import time
+import threading
 from dotenv import load_dotenv
 
+from metrics import Histogram, metrics_registry
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sdlc_assistant.db")
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+IN_MEMORY = IS_SQLITE and (":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/") == "sqlite:")
+
+# Connect-time pragmas for file-backed SQLite. WAL lets readers run alongside
+# the single writer, and busy_timeout makes writers queue instead of failing.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # Negative values are KiB rather than pages
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024))),
+}
+
+FINE_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+class DatabaseMetrics:
+    """Pool checkout waits, statement latency and lock contention"""
+
+    def __init__(self):
+        self.pool_wait = Histogram(FINE_BUCKETS)
+        self.read_time = Histogram(FINE_BUCKETS)
+        self.write_time = Histogram(FINE_BUCKETS)
+        self._lock = threading.Lock()
+        self._checkouts = 0
+        self._lock_errors = 0
+
+    def checked_out(self):
+        with self._lock:
+            self._checkouts += 1
+
+    def lock_error(self):
+        with self._lock:
+            self._lock_errors += 1
+
+    def stats(self) -> dict:
+        pool = engine.pool
+        with self._lock:
+            stats = {
+                "dialect": engine.dialect.name,
+                "pool": type(pool).__name__,
+                "checkouts": self._checkouts,
+                "lock_errors": self._lock_errors,
+            }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            })
+        stats.update({
+            "pool_wait": self.pool_wait.snapshot(),
+            "read_time": self.read_time.snapshot(),
+            "write_time": self.write_time.snapshot(),
+        })
+        return stats
+
+db_metrics = DatabaseMetrics()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_metrics.pool_wait.observe((time.perf_counter() - started) * 1000)
+
+def engine_options() -> dict:
+    if IN_MEMORY:
+        return {"connect_args": {"check_same_thread": False}}
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    }
+    if IS_SQLITE:
+        options["connect_args"] = {"check_same_thread": False}
+    else:
+        options["pool_pre_ping"] = True
+        options["pool_recycle"] = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    return options
+
+engine = create_engine(DATABASE_URL, **engine_options())
+
+if IS_SQLITE and not IN_MEMORY:
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+@event.listens_for(engine, "checkout")
+def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+    db_metrics.checked_out()
+
+@event.listens_for(engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+    elapsed = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+    # Under SQLite, write latency is mostly time spent waiting for the write lock
+    if statement.lstrip().upper().startswith(WRITE_PREFIXES):
+        db_metrics.write_time.observe(elapsed)
+    else:
+        db_metrics.read_time.observe(elapsed)
+
+@event.listens_for(engine, "handle_error")
+def _count_lock_errors(context):
+    conn = context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+    if "database is locked" in str(context.original_exception):
+        db_metrics.lock_error()
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+metrics_registry.register("database", db_metrics.stats)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -24,4 +147,4 @@ def get_db():
         db.close()
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
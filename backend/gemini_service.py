@@ -1,9 +1,15 @@
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
+from topic_filter import OFF_TOPIC_REFUSAL
 
 load_dotenv()
 
+ERROR_PREFIX = "I apologize, but I encountered an error: "
+
+def is_error_response(text: str) -> bool:
+    return text.startswith(ERROR_PREFIX)
+
 class GeminiService:
     def __init__(self):
         self.api_key = os.getenv("GEMINI_API_KEY")
@@ -11,13 +17,11 @@ class GeminiService:
         # Use the current available model from your test results
         self.model = genai.GenerativeModel('models/gemini-2.5-flash')
     
-    def get_voice_response(self, text: str) -> str:
-        """Get response for voice assistant queries - SDLC topics only, no code"""
-        try:
-            prompt = f"""You are a specialized SDLC (Software Development Life Cycle) assistant. You ONLY answer questions related to software development, SDLC processes, methodologies, best practices, tools, and concepts.
+    def _build_prompt(self, text: str) -> str:
+        return f"""You are a specialized SDLC (Software Development Life Cycle) assistant. You ONLY answer questions related to software development, SDLC processes, methodologies, best practices, tools, and concepts.
 
 IMPORTANT RULES:
-1. If the question is NOT related to software development, politely decline and say: "I can only help with software development and SDLC related questions. Please ask me about development processes, methodologies, or best practices."
+1. If the question is NOT related to software development, politely decline and say: "{OFF_TOPIC_REFUSAL}"
 
 2. NEVER provide code snippets or programming code in your response. Instead, explain the PROCESS, STEPS, METHODOLOGY, or CONCEPT behind it.
 
@@ -34,10 +38,25 @@ IMPORTANT RULES:
 User Question: '{text}'
 
 Your Response:"""
+
+    def get_voice_response(self, text: str) -> str:
+        """Get response for voice assistant queries - SDLC topics only, no code"""
+        try:
+            prompt = self._build_prompt(text)
             
             response = self.model.generate_content(prompt)
             return response.text
         except Exception as e:
-            return f"I apologize, but I encountered an error: {str(e)}"
+            return ERROR_PREFIX + str(e)
+
+    def get_voice_response_stream(self, text: str):
+        """Yield the voice assistant response in chunks as Gemini produces them.
+
+        Raises if Gemini fails, possibly after some chunks, so callers can
+        tell a cut-off answer from a complete one.
+        """
+        response = self.model.generate_content(self._build_prompt(text), stream=True)
+        for chunk in response:
+            yield chunk.text
 
 gemini_service = GeminiService()
\ No newline at end of file
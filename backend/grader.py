@@ -0,0 +1,214 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dotenv import load_dotenv
+
+from code_executor import code_executor
+from metrics import Histogram, metrics_registry
+
+load_dotenv()
+
+def case_passed(test_case: dict, result: dict) -> bool:
+    return result["success"] and test_case["output"] in result["output"]
+
+class GradingEngine:
+    """Runs a submission's test cases concurrently under a global CPU budget.
+
+    Every running test case holds one slot of the shared CPU budget, so
+    concurrent submissions from many users together never run more cases
+    than there are slots.
+
+    In "batch" mode a submission's cases are split into a few contiguous
+    chunks, and each chunk is loaded once into a single sandbox worker or
+    Java harness that runs its cases in order. In "per_case" mode every
+    case is scheduled on its own.
+    """
+
+    def __init__(self, cpu_budget: int, max_parallel_per_submission: int, mode: str, batch_min_cases: int):
+        self.cpu_budget = cpu_budget
+        self.max_parallel_per_submission = max_parallel_per_submission
+        self.mode = mode
+        self.batch_min_cases = max(1, batch_min_cases)
+        self._cpu_slots = threading.BoundedSemaphore(cpu_budget)
+        self._executor = ThreadPoolExecutor(
+            max_workers=cpu_budget * 2,
+            thread_name_prefix="grader"
+        )
+        self._lock = threading.Lock()
+        self._running_cases = 0
+        self._submissions = 0
+        self._cases = 0
+        self._cancelled_cases = 0
+        self.case_wall = Histogram()
+
+    def _run_case(self, code: str, language: str, test_input: str) -> dict:
+        with self._cpu_slots:
+            with self._lock:
+                self._running_cases += 1
+            started = time.perf_counter()
+            try:
+                result = code_executor.execute_code(code, language, test_input)
+            finally:
+                with self._lock:
+                    self._running_cases -= 1
+        result.setdefault("wall_ms", round((time.perf_counter() - started) * 1000, 3))
+        return result
+
+    def _chunks(self, count: int) -> list:
+        """Split count cases into contiguous (start, end) ranges, one per batch worker"""
+        chunk_count = max(1, min(self.max_parallel_per_submission, -(-count // self.batch_min_cases)))
+        size, extra = divmod(count, chunk_count)
+        ranges = []
+        start = 0
+        for i in range(chunk_count):
+            end = start + size + (1 if i < extra else 0)
+            if end > start:
+                ranges.append((start, end))
+            start = end
+        return ranges
+
+    def _run_batched(self, code: str, language: str, test_cases: list, fail_fast: bool, on_result) -> dict:
+        """Run contiguous chunks of cases, each loaded once into a single sandbox process or JVM"""
+        outcomes = {}
+        stop = threading.Event()
+        inputs = [case.get("input", "") for case in test_cases]
+
+        def record(index, result):
+            outcomes[index] = result
+            if on_result:
+                on_result(index, self._case_payload(test_cases[index], result))
+            if fail_fast and not case_passed(test_cases[index], result):
+                stop.set()
+
+        def run_chunk(start, end):
+            if stop.is_set():
+                return
+            position = [start]
+
+            def keep_going(result):
+                record(position[0], result)
+                position[0] += 1
+                return not stop.is_set()
+
+            with self._cpu_slots:
+                with self._lock:
+                    self._running_cases += 1
+                try:
+                    results = code_executor.run_submission(
+                        code, language, inputs[start:end], keep_going=keep_going
+                    )
+                finally:
+                    with self._lock:
+                        self._running_cases -= 1
+            # Results that never went through keep_going (e.g. the sandbox itself failed)
+            for offset, result in enumerate(results):
+                if start + offset not in outcomes:
+                    record(start + offset, result)
+
+        futures = [self._executor.submit(run_chunk, start, end) for start, end in self._chunks(len(test_cases))]
+        for future in futures:
+            future.result()
+        return outcomes
+
+    def _run_parallel(self, code: str, language: str, test_cases: list, fail_fast: bool, on_result) -> dict:
+        outcomes = {}
+        next_index = 0
+        running = {}
+        failed = False
+
+        while running or (next_index < len(test_cases) and not failed):
+            while (not failed and next_index < len(test_cases)
+                    and len(running) < self.max_parallel_per_submission):
+                future = self._executor.submit(
+                    self._run_case, code, language, test_cases[next_index].get("input", "")
+                )
+                running[future] = next_index
+                next_index += 1
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"success": False, "output": "", "error": str(e)}
+                outcomes[index] = result
+                if on_result:
+                    on_result(index, self._case_payload(test_cases[index], result))
+                if fail_fast and not case_passed(test_cases[index], result):
+                    failed = True
+        return outcomes
+
+    @staticmethod
+    def _case_payload(test_case: dict, result: dict) -> dict:
+        return {
+            "input": test_case["input"],
+            "expected": test_case["output"],
+            "actual": result["output"],
+            "passed": case_passed(test_case, result),
+            "error": result.get("error", ""),
+            "wall_ms": result.get("wall_ms"),
+            "cpu_ms": result.get("cpu_ms")
+        }
+
+    def grade(self, code: str, language: str, test_cases: list, fail_fast: bool = False, on_result=None) -> dict:
+        """Run every test case and return {"results": [...], "all_passed": bool}.
+
+        With fail_fast, cases not yet started when the first failure lands are
+        skipped. on_result(index, payload) is called as each case finishes.
+        """
+        if self.mode == "batch":
+            outcomes = self._run_batched(code, language, test_cases, fail_fast, on_result)
+        else:
+            outcomes = self._run_parallel(code, language, test_cases, fail_fast, on_result)
+
+        results = []
+        for index, test_case in enumerate(test_cases):
+            if index in outcomes:
+                payload = self._case_payload(test_case, outcomes[index])
+                if payload["wall_ms"] is not None:
+                    self.case_wall.observe(payload["wall_ms"])
+            else:
+                payload = {
+                    "input": test_case["input"],
+                    "expected": test_case["output"],
+                    "actual": "",
+                    "passed": False,
+                    "skipped": True,
+                    "error": "Skipped after an earlier test case failed",
+                    "wall_ms": None,
+                    "cpu_ms": None
+                }
+            results.append(payload)
+
+        with self._lock:
+            self._submissions += 1
+            self._cases += len(outcomes)
+            self._cancelled_cases += len(test_cases) - len(outcomes)
+
+        return {
+            "results": results,
+            "all_passed": len(outcomes) == len(test_cases) and all(r["passed"] for r in results)
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "cpu_budget": self.cpu_budget,
+                "mode": self.mode,
+                "running_cases": self._running_cases,
+                "submissions": self._submissions,
+                "cases": self._cases,
+                "cancelled_cases": self._cancelled_cases,
+                "case_wall": self.case_wall.snapshot()
+            }
+
+_cpu_budget = int(os.getenv("GRADING_CPU_BUDGET", str(os.cpu_count() or 2)))
+grading_engine = GradingEngine(
+    cpu_budget=_cpu_budget,
+    max_parallel_per_submission=int(os.getenv("GRADING_MAX_PARALLEL_PER_SUBMISSION", str(_cpu_budget))),
+    mode=os.getenv("GRADING_MODE", "batch"),
+    batch_min_cases=int(os.getenv("GRADING_BATCH_MIN_CASES", "8"))
+)
+metrics_registry.register("grading", grading_engine.stats)
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+from dotenv import load_dotenv
+
+from database import SessionLocal
+from models import CodingProblem, ChallengeAttempt
+from grader import grading_engine
+from verdict_cache import verdict_cache
+from metrics import Histogram, metrics_registry
+
+load_dotenv()
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+def record_attempt(db, user_id: int, problem: CodingProblem, code: str, language: str,
+                   grading: dict, cached: bool) -> dict:
+    attempt = ChallengeAttempt(
+        user_id=user_id,
+        problem_id=problem.id,
+        code=code,
+        language=language,
+        passed=grading["all_passed"]
+    )
+    db.add(attempt)
+    db.commit()
+
+    return {"results": grading["results"], "all_passed": grading["all_passed"], "cached": cached}
+
+def grade_submission(db, user_id: int, problem: CodingProblem, code: str, language: str,
+                     fail_fast: bool = False, on_result=None) -> dict:
+    """Grade a submission (or reuse its stored verdict) and record the attempt"""
+    # Identical resubmissions reuse the stored verdict instead of re-running
+    grading = verdict_cache.lookup(db, problem, language, code)
+    cached = grading is not None
+    if not cached:
+        test_cases = json.loads(problem.test_cases)
+        grading = grading_engine.grade(code, language, test_cases, fail_fast, on_result)
+        verdict_cache.store(db, problem, language, code, grading)
+    return record_attempt(db, user_id, problem, code, language, grading, cached)
+
+class QueueFull(Exception):
+    pass
+
+class GradingJob:
+    def __init__(self, user_id: int, problem_id: int, code: str, language: str,
+                 fail_fast: bool, priority: int, total_cases: int):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.problem_id = problem_id
+        self.code = code
+        self.language = language
+        self.fail_fast = fail_fast
+        self.priority = priority
+        self.total_cases = total_cases
+        self.status = "queued"
+        self.results = {}
+        self.outcome = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            snapshot = {
+                "job_id": self.id,
+                "status": self.status,
+                "problem_id": self.problem_id,
+                "total_cases": self.total_cases,
+                "completed_cases": len(self.results),
+                "progress": [
+                    {"index": index, **result} for index, result in sorted(self.results.items())
+                ],
+                "error": self.error
+            }
+            if self.outcome is not None:
+                snapshot.update(self.outcome)
+            return snapshot
+
+    def subscribe(self, loop, queue):
+        """Forward every job event to an asyncio queue on the given loop"""
+        with self._lock:
+            self._subscribers.append((loop, queue))
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers = [(l, q) for l, q in self._subscribers if q is not queue]
+
+    def _publish(self, event: dict):
+        for loop, queue in self._subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's event loop has shut down
+                pass
+
+    def record_case(self, index: int, result: dict):
+        with self._lock:
+            self.results[index] = result
+            self._publish({"event": "case", "index": index, **result})
+
+    def set_status(self, status: str, outcome: dict = None, error: str = None):
+        with self._lock:
+            self.status = status
+            if status == "running":
+                self.started_at = time.time()
+            if status in ("completed", "failed"):
+                self.finished_at = time.time()
+            self.outcome = outcome
+            self.error = error
+            event = {"event": status, "error": error}
+            if outcome is not None:
+                event.update(outcome)
+            self._publish(event)
+
+class GradingQueue:
+    """In-process grading job queue drained by a pool of worker threads.
+
+    Jobs are picked by priority first and then round-robin across users, so
+    one user with many queued submissions cannot starve everyone else.
+    """
+
+    def __init__(self, workers: int, max_queued: int, job_ttl: float, small_job_cases: int):
+        self.worker_count = workers
+        self.max_queued = max_queued
+        self.job_ttl = job_ttl
+        self.small_job_cases = small_job_cases
+        self._jobs = {}
+        # priority -> OrderedDict(user_id -> deque of jobs); order is the round-robin order
+        self._queues = {}
+        self._queued = 0
+        self._condition = threading.Condition()
+        self._workers = []
+        self._running = False
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self.queue_wait = Histogram()
+        self.run_time = Histogram()
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        for i in range(self.worker_count):
+            worker = threading.Thread(target=self._work, name=f"grading-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout: float = 5):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def priority_for(self, total_cases: int) -> int:
+        # Short jobs first keeps average wait low without starving large ones for long
+        return PRIORITY_HIGH if total_cases <= self.small_job_cases else PRIORITY_NORMAL
+
+    def submit(self, db, user_id: int, problem: CodingProblem, code: str, language: str,
+               fail_fast: bool = False) -> GradingJob:
+        """Queue a submission for grading; stored verdicts complete immediately"""
+        total_cases = len(json.loads(problem.test_cases))
+        job = GradingJob(
+            user_id, problem.id, code, language, fail_fast,
+            self.priority_for(total_cases), total_cases
+        )
+
+        grading = verdict_cache.lookup(db, problem, language, code)
+        if grading is not None:
+            for index, result in enumerate(grading["results"]):
+                job.record_case(index, result)
+            job.set_status("running")
+            job.set_status("completed", record_attempt(db, user_id, problem, code, language, grading, True))
+            with self._condition:
+                self._purge_expired()
+                self._jobs[job.id] = job
+                self._completed += 1
+            return job
+
+        with self._condition:
+            self._purge_expired()
+            if self._queued >= self.max_queued:
+                self._rejected += 1
+                raise QueueFull("Grading queue is full")
+            self._jobs[job.id] = job
+            users = self._queues.setdefault(job.priority, OrderedDict())
+            users.setdefault(user_id, deque()).append(job)
+            self._queued += 1
+            self._condition.notify()
+        return job
+
+    def get(self, job_id: str):
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.job_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _next_job(self):
+        """Pop the next job: lowest priority value first, then the next user in rotation"""
+        for priority in sorted(self._queues):
+            users = self._queues[priority]
+            if not users:
+                continue
+            user_id, jobs = next(iter(users.items()))
+            job = jobs.popleft()
+            del users[user_id]
+            if jobs:
+                users[user_id] = jobs
+            self._queued -= 1
+            return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while self._running and self._queued == 0:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                job = self._next_job()
+            self._process(job)
+
+    def _process(self, job: GradingJob):
+        self.queue_wait.observe((time.time() - job.created_at) * 1000)
+        job.set_status("running")
+        db = SessionLocal()
+        try:
+            problem = db.query(CodingProblem).filter(CodingProblem.id == job.problem_id).first()
+            if problem is None:
+                raise ValueError("Problem not found")
+            outcome = grade_submission(
+                db, job.user_id, problem, job.code, job.language, job.fail_fast, job.record_case
+            )
+            job.set_status("completed", outcome)
+            with self._condition:
+                self._completed += 1
+        except Exception as e:
+            db.rollback()
+            job.set_status("failed", error=str(e))
+            with self._condition:
+                self._failed += 1
+        finally:
+            db.close()
+            self.run_time.observe((time.time() - job.started_at) * 1000)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "workers": self.worker_count,
+                "queued": self._queued,
+                "queued_users": sum(len(users) for users in self._queues.values()),
+                "tracked_jobs": len(self._jobs),
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "queue_wait": self.queue_wait.snapshot(),
+                "run_time": self.run_time.snapshot()
+            }
+
+grading_queue = GradingQueue(
+    workers=int(os.getenv("GRADING_WORKERS", str(max(2, os.cpu_count() or 2)))),
+    max_queued=int(os.getenv("GRADING_QUEUE_MAX", "1000")),
+    job_ttl=float(os.getenv("GRADING_JOB_TTL_SECONDS", "3600")),
+    small_job_cases=int(os.getenv("GRADING_SMALL_JOB_CASES", "10"))
+)
+metrics_registry.register("grading_queue", grading_queue.stats)
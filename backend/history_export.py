@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import uuid
+import zipfile
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from sqlalchemy.orm import joinedload
+
+from database import SessionLocal
+from models import History
+from history_store import load_texts, format_history
+from pdf_export import render_pdf, CHUNK_SIZE
+from metrics import metrics_registry
+from admission import AdmissionDenied
+
+load_dotenv()
+
+EXPORT_FORMATS = ("zip", "jsonl")
+ENTRY_FORMATS = ("md", "pdf")
+# Rows fetched per round trip while walking a user's history
+CURSOR_BATCH_SIZE = 100
+# Suggested wait before starting another export once the limits are reached
+EXPORT_RETRY_SECONDS = 10
+
+def iter_entries(user_id: int, ids=None):
+    """Yield (history, input_text, output_text) oldest first, holding one batch in memory"""
+    db = SessionLocal()
+    try:
+        query = db.query(History).options(joinedload(History.payload)).filter(History.user_id == user_id)
+        if ids:
+            query = query.filter(History.id.in_(ids))
+        query = query.order_by(History.created_at, History.id).execution_options(stream_results=True)
+        for history in query.yield_per(CURSOR_BATCH_SIZE):
+            input_text, output_text = load_texts(history)
+            yield history, input_text, output_text
+            # Drop each entry once exported so the identity map stays bounded
+            db.expunge(history)
+    finally:
+        db.close()
+
+def markdown_entry(history: History, input_text: str, output_text: str) -> str:
+    title, _ = format_history(history.request_type, input_text, output_text)
+    return (
+        f"# {title}\n\n"
+        f"_{history.created_at.isoformat()}_\n\n"
+        f"## Input\n\n```\n{input_text}\n```\n\n"
+        f"## Output\n\n```\n{output_text}\n```\n"
+    )
+
+def entry_name(history: History, extension: str) -> str:
+    stamp = history.created_at.strftime("%Y%m%d-%H%M%S")
+    return f"{stamp}-{history.id}-{history.request_type}.{extension}"
+
+class _ChunkSink:
+    """Write-only stream that zipfile writes into and the exporter drains"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_jsonl(entries):
+    for history, input_text, output_text in entries:
+        yield (json.dumps({
+            "id": history.id,
+            "type": history.request_type,
+            "created_at": history.created_at.isoformat(),
+            "input": input_text,
+            "output": output_text
+        }) + "\n").encode()
+
+def iter_zip(entries, entry_format: str):
+    """Build a ZIP on the fly; zipfile uses data descriptors since the sink can't seek"""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for history, input_text, output_text in entries:
+            if entry_format == "pdf":
+                title, content = format_history(history.request_type, input_text, output_text)
+                with render_pdf(title, content) as rendered, \
+                        archive.open(entry_name(history, "pdf"), "w", force_zip64=True) as member:
+                    while True:
+                        chunk = rendered.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        member.write(chunk)
+                        yield sink.drain()
+            else:
+                archive.writestr(entry_name(history, "md"), markdown_entry(history, input_text, output_text))
+            yield sink.drain()
+    yield sink.drain()
+
+def iter_export(user_id: int, export_format: str, entry_format: str = "md", ids=None):
+    """Yield the export as byte chunks; memory stays bounded by one entry"""
+    entries = iter_entries(user_id, ids)
+    chunks = iter_jsonl(entries) if export_format == "jsonl" else iter_zip(entries, entry_format)
+    for chunk in chunks:
+        if chunk:
+            yield chunk
+
+def export_filename(export_format: str) -> str:
+    return f"sdlc_history_{time.strftime('%Y%m%d-%H%M%S')}.{export_format}"
+
+class ExportJob:
+    def __init__(self, user_id: int, export_format: str, entry_format: str, ids):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.export_format = export_format
+        self.entry_format = entry_format
+        self.ids = ids
+        self.filename = export_filename(export_format)
+        self.path = None
+        self.status = "queued"
+        self.error = None
+        self.bytes_written = 0
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def snapshot(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "format": self.export_format,
+            "filename": self.filename,
+            "bytes_written": self.bytes_written,
+            "error": self.error
+        }
+
+class ExportManager:
+    """Background exports written to disk for very large histories.
+
+    Jobs run on a fixed pool of max_running threads. A user may have
+    max_per_user exports queued, running or streaming, and everyone
+    together max_pending; further requests raise AdmissionDenied.
+    """
+
+    def __init__(self, root: str, max_running: int, max_per_user: int, max_pending: int, ttl_seconds: float):
+        self.root = root
+        self.ttl = ttl_seconds
+        self.max_per_user = max_per_user
+        self.max_pending = max_pending
+        self._jobs = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix="export")
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        os.makedirs(root, exist_ok=True)
+
+    def start(self, user_id: int, export_format: str, entry_format: str, ids=None) -> ExportJob:
+        job = ExportJob(user_id, export_format, entry_format, ids)
+        with self._lock:
+            self._purge_expired()
+            self._admit(user_id)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def stream(self, user_id: int, export_format: str, entry_format: str, ids=None):
+        """Return (chunks, release) for an export streamed straight to the client.
+
+        The stream counts against the limits until release() is called; the
+        generator calls it when it ends, and release() is idempotent so it
+        can also be called for a client that leaves before it starts.
+        """
+        with self._lock:
+            self._admit(user_id)
+            self._streams[user_id] = self._streams.get(user_id, 0) + 1
+        released = []
+
+        def release():
+            with self._lock:
+                if released:
+                    return
+                released.append(True)
+                self._streams[user_id] -= 1
+                if not self._streams[user_id]:
+                    del self._streams[user_id]
+
+        def chunks():
+            try:
+                yield from iter_export(user_id, export_format, entry_format, ids)
+            finally:
+                release()
+
+        return chunks(), release
+
+    def _admit(self, user_id: int):
+        """Raise AdmissionDenied if user_id may not start another export; call with the lock held"""
+        pending = [job.user_id for job in self._jobs.values() if job.finished_at is None]
+        mine = pending.count(user_id) + self._streams.get(user_id, 0)
+        reason = None
+        if mine >= self.max_per_user:
+            reason = "user_concurrency"
+        elif len(pending) + sum(self._streams.values()) >= self.max_pending:
+            reason = "concurrency"
+        if reason:
+            self._rejected += 1
+            raise AdmissionDenied("export", reason, EXPORT_RETRY_SECONDS)
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: ExportJob):
+        job.status = "running"
+        fd, path = tempfile.mkstemp(dir=self.root, suffix=f".{job.export_format}")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter_export(job.user_id, job.export_format, job.entry_format, job.ids):
+                    f.write(chunk)
+                    job.bytes_written += len(chunk)
+            job.path = path
+            job.status = "completed"
+            with self._lock:
+                self._completed += 1
+        except Exception as e:
+            os.unlink(path)
+            job.status = "failed"
+            job.error = str(e)
+            with self._lock:
+                self._failed += 1
+        job.finished_at = time.time()
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                if job.path and os.path.exists(job.path):
+                    os.unlink(job.path)
+                del self._jobs[job_id]
+
+    def shutdown(self):
+        """Drop queued exports and delete this process's finished export files"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.path and os.path.exists(job.path):
+                    os.unlink(job.path)
+            self._jobs.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tracked_jobs": len(self._jobs),
+                "queued": sum(1 for job in self._jobs.values() if job.status == "queued"),
+                "running": sum(1 for job in self._jobs.values() if job.status == "running"),
+                "streaming": sum(self._streams.values()),
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected
+            }
+
+export_manager = ExportManager(
+    root=os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "sdlc_exports")),
+    max_running=int(os.getenv("EXPORT_MAX_RUNNING", "2")),
+    max_per_user=int(os.getenv("EXPORT_MAX_PER_USER", "1")),
+    max_pending=int(os.getenv("EXPORT_MAX_PENDING", "8")),
+    ttl_seconds=float(os.getenv("EXPORT_TTL_SECONDS", "3600"))
+)
+metrics_registry.register("exports", export_manager.stats)
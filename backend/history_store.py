@@ -0,0 +1,93 @@
+import json
+import zlib
+from sqlalchemy import select, update
+
+from models import History, HistoryPayload
+
+PREVIEW_CHARS = 200
+MIGRATION_BATCH_SIZE = 500
+
+# codec name -> (compress, decompress); the name is stored with each payload
+CODECS = {
+    "zlib": (lambda data: zlib.compress(data, 6), zlib.decompress)
+}
+
+HISTORY_TITLES = {
+    "code_generation": "Code Generation",
+    "test_cases": "Test Cases",
+    "bug_fix": "Bug Fix",
+    "requirements_to_code": "Requirements to Code"
+}
+
+def preview(text: str) -> str:
+    return text[:PREVIEW_CHARS] + "..." if len(text) > PREVIEW_CHARS else text
+
+def encode_payload(input_text: str, output_text: str) -> dict:
+    compress, _ = CODECS["zlib"]
+    return {
+        "codec": "zlib",
+        "input_blob": compress((input_text or "").encode()),
+        "output_blob": compress((output_text or "").encode())
+    }
+
+def build_history(user_id: int, request_type: str, input_text: str, output_text: str) -> History:
+    """A summary row plus its compressed payload, ready to add to a session"""
+    input_text = input_text or ""
+    output_text = output_text or ""
+    return History(
+        user_id=user_id,
+        request_type=request_type,
+        input_preview=preview(input_text),
+        input_size=len(input_text),
+        output_size=len(output_text),
+        payload=HistoryPayload(**encode_payload(input_text, output_text))
+    )
+
+def load_texts(history: History):
+    """Return (input_text, output_text), reading legacy rows that were never migrated"""
+    payload = history.payload
+    if payload is None:
+        return history.input_text or "", history.output_text or ""
+    _, decompress = CODECS[payload.codec]
+    return decompress(payload.input_blob).decode(), decompress(payload.output_blob).decode()
+
+def migrate_legacy_rows(connection):
+    """Move full-text history columns into compressed payload rows, in batches"""
+    histories = History.__table__
+    while True:
+        rows = connection.execute(
+            select(histories.c.id, histories.c.input_text, histories.c.output_text)
+            .where(histories.c.input_preview.is_(None))
+            .limit(MIGRATION_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        for history_id, input_text, output_text in rows:
+            input_text = input_text or ""
+            output_text = output_text or ""
+            connection.execute(HistoryPayload.__table__.insert().values(
+                history_id=history_id, **encode_payload(input_text, output_text)
+            ))
+            connection.execute(
+                update(histories).where(histories.c.id == history_id).values(
+                    input_preview=preview(input_text),
+                    input_size=len(input_text),
+                    output_size=len(output_text),
+                    input_text=None,
+                    output_text=None
+                )
+            )
+
+def format_history(request_type: str, input_text: str, output_text: str):
+    """Return (title, plain-text body) for exporting a history entry"""
+    title = HISTORY_TITLES.get(request_type, request_type)
+    if request_type == "requirements_to_code":
+        try:
+            result = json.loads(output_text)
+            output_text = "\n\n\n".join(
+                f"{section.upper().replace('_', ' ')}:\n\n{result.get(section, '')}"
+                for section in ("documentation", "code", "test_cases")
+            )
+        except (ValueError, AttributeError):
+            pass
+    return title, f"INPUT:\n\n{input_text}\n\n\nOUTPUT:\n\n{output_text}"
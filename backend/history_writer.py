@@ -0,0 +1,141 @@
+import os
+import time
+import queue
+import threading
+from dotenv import load_dotenv
+
+from database import SessionLocal
+from history_store import build_history
+from metrics import Histogram, metrics_registry
+
+load_dotenv()
+
+class HistoryWriter:
+    """Write-behind history logging.
+
+    Requests enqueue (user_id, request_type, input, output) records and
+    return at once; a background thread commits them in batches of up to
+    batch_size rows, at most flush_interval_ms after the first one queued.
+    When the queue is full, submit() refuses the record and the caller
+    writes it itself, which slows the overloaded request instead of
+    dropping history.
+    """
+
+    def __init__(self, batch_size: int, flush_interval_ms: float, max_queued: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._written = 0
+        self._batches = 0
+        self._sync_writes = 0
+        self._failed = 0
+        self.batch_time = Histogram()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Stop the flush thread after it has written everything still queued"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping.set()
+        thread.join(timeout)
+        # Anything enqueued after the thread's final drain
+        self.write(self._drain(self._queue.qsize()))
+
+    def submit(self, user_id: int, request_type: str, input_text: str, output_text: str) -> bool:
+        """Queue a record; False means the queue is full and the caller must write() it"""
+        if self._thread is None:
+            return False
+        try:
+            self._queue.put_nowait((user_id, request_type, input_text, output_text))
+            return True
+        except queue.Full:
+            return False
+
+    def write(self, records: list, sync: bool = False):
+        """Commit records in one transaction"""
+        if not records:
+            return
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.add_all([build_history(*record) for record in records])
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self._failed += len(records)
+            raise
+        finally:
+            db.close()
+        self.batch_time.observe((time.perf_counter() - started) * 1000)
+        with self._lock:
+            self._written += len(records)
+            self._batches += 1
+            if sync:
+                self._sync_writes += len(records)
+
+    def _drain(self, limit: int) -> list:
+        records = []
+        while len(records) < limit:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return records
+
+    def _collect(self) -> list:
+        """Block for the first record, then gather more until the batch is full or the interval ends"""
+        try:
+            records = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(records) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set():
+                break
+            try:
+                records.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return records + self._drain(self.batch_size - len(records))
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            records = self._collect()
+            try:
+                self.write(records)
+            except Exception:
+                # Counted in stats; keep the thread alive for later batches
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "max_queued": self._queue.maxsize,
+                "written": self._written,
+                "batches": self._batches,
+                "sync_writes": self._sync_writes,
+                "failed": self._failed,
+                "batch_time": self.batch_time.snapshot()
+            }
+
+history_writer = HistoryWriter(
+    batch_size=int(os.getenv("HISTORY_BATCH_SIZE", "100")),
+    flush_interval_ms=float(os.getenv("HISTORY_FLUSH_INTERVAL_MS", "200")),
+    max_queued=int(os.getenv("HISTORY_QUEUE_MAX", "10000"))
+)
+metrics_registry.register("history_writer", history_writer.stats)
@@ -1,23 +1,207 @@
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from ibm_watson_machine_learning.foundation_models import Model
 from ibm_watson_machine_learning.metanames import GenTextParamsMetaNames as GenParams
 
+from metrics import Histogram, metrics_registry
+from response_cache import response_cache
+from token_budget import token_budgeter
+
 load_dotenv()
 
+PROMPT_TEMPLATES = {
+    "code": """You are a code generation assistant. Generate clean, well-commented code.
+
+User Request: {prompt}
+
+Generate only the code without any additional explanation:""",
+
+    "test_cases": """You are a test case generation assistant. Generate comprehensive test cases.
+
+Code:
+{code}
+
+Generate test cases in a clear format with test case name, input, expected output, and test type:""",
+
+    "bug_fix": """You are a bug fixing assistant. Fix the bug and explain the fix.
+
+Code with Bug:
+{code}
+
+Bug Description: {bug_description}
+
+Provide the fixed code and explanation:""",
+
+    "documentation": """Generate project documentation for the following requirements:
+
+Requirements: {requirements}
+
+Provide: Project Overview, Architecture, Components, and Implementation Plan""",
+
+    "implementation": """Generate complete code implementation for:
+
+Requirements: {requirements}
+
+Provide clean, production-ready code:""",
+
+    "requirement_tests": """Generate comprehensive test cases for:
+
+Requirements: {requirements}
+
+Code:
+{code}
+
+Provide detailed test cases:""",
+
+    "uml": """Generate a PlantUML code for class diagram based on:
+
+Requirements: {requirements}
+
+Provide only PlantUML code starting with @startuml and ending with @enduml:"""
+}
+
+class _PooledModel:
+    def __init__(self, model, build_ms: float):
+        self.model = model
+        self.build_ms = build_ms
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+class ModelPool:
+    """Thread-safe pool of long-lived Granite Model clients.
+
+    Each client holds an IAM token and its HTTP connections, so reusing it
+    skips the token exchange and TLS handshake. Clients are rebuilt in the
+    background before their token lifetime runs out.
+    """
+
+    def __init__(self, factory, size: int, refresh_after: float):
+        self._factory = factory
+        self.size = size
+        self.refresh_after = refresh_after
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._reused = 0
+        self._discarded = 0
+        self._saved_ms = 0.0
+        self.cold_build = Histogram()
+        self._refresher = None
+
+    def _build(self) -> _PooledModel:
+        started = time.perf_counter()
+        model = self._factory()
+        build_ms = (time.perf_counter() - started) * 1000
+        self.cold_build.observe(build_ms)
+        with self._lock:
+            self._created += 1
+        return _PooledModel(model, build_ms)
+
+    def _is_stale(self, entry: _PooledModel) -> bool:
+        return time.monotonic() - entry.created_at >= self.refresh_after
+
+    def _take(self) -> _PooledModel:
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                return self._build()
+            if self._is_stale(entry):
+                with self._lock:
+                    self._discarded += 1
+                continue
+            with self._lock:
+                self._reused += 1
+                self._saved_ms += self.cold_build.snapshot()["avg_ms"]
+            return entry
+
+    @contextmanager
+    def acquire(self):
+        """Check out a client for the duration of one generation"""
+        self._ensure_refresher()
+        self._slots.acquire()
+        try:
+            entry = self._take()
+            try:
+                yield entry.model
+            except Exception:
+                # The client may hold a broken connection or token; drop it.
+                with self._lock:
+                    self._discarded += 1
+                raise
+            entry.uses += 1
+            self._idle.put(entry)
+        finally:
+            self._slots.release()
+
+    def _ensure_refresher(self):
+        if self._refresher is not None:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name="granite-token-refresh", daemon=True
+                )
+                self._refresher.start()
+
+    def _refresh_loop(self):
+        interval = max(1.0, min(60.0, self.refresh_after / 10))
+        while True:
+            time.sleep(interval)
+            self._refresh_idle()
+
+    def _refresh_idle(self):
+        """Rebuild idle clients whose token is about to expire, off the request path"""
+        fresh = []
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._is_stale(entry):
+                with self._lock:
+                    self._discarded += 1
+                try:
+                    entry = self._build()
+                except Exception:
+                    continue
+            fresh.append(entry)
+        for entry in fresh:
+            self._idle.put(entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "created": self._created,
+                "reused": self._reused,
+                "discarded": self._discarded,
+                "cold_build": self.cold_build.snapshot(),
+                "latency_saved_ms_total": round(self._saved_ms, 2),
+                "latency_saved_ms_per_request": round(
+                    self._saved_ms / (self._created + self._reused), 2
+                ) if self._created + self._reused else 0.0
+            }
+
 class IBMService:
     def __init__(self):
         self.api_key = os.getenv("IBM_API_KEY")
         self.project_id = os.getenv("IBM_PROJECT_ID")
         self.url = os.getenv("IBM_URL")
-        
+
         self.credentials = {
             "url": self.url,
             "apikey": self.api_key
         }
-        
+
         self.model_id = "ibm/granite-3-8b-instruct"
-        
+
         self.parameters = {
             GenParams.DECODING_METHOD: "greedy",
             GenParams.MAX_NEW_TOKENS: 2000,
@@ -26,126 +210,125 @@ class IBMService:
             GenParams.TOP_K: 50,
             GenParams.TOP_P: 1
         }
-    
-    def generate_code(self, prompt: str) -> str:
-        """Generate code based on user prompt"""
-        model = Model(
-            model_id=self.model_id,
-            params=self.parameters,
-            credentials=self.credentials,
-            project_id=self.project_id
-        )
-        
-        full_prompt = f"""You are a code generation assistant. Generate clean, well-commented code.
 
-User Request: {prompt}
+        # Per-task overrides merged on top of self.parameters for each call
+        self.task_parameters = {
+            task: {GenParams.MAX_NEW_TOKENS: token_budgeter.max_new_tokens(task)}
+            for task in PROMPT_TEMPLATES
+        }
 
-Generate only the code without any additional explanation:"""
-        
-        response = model.generate_text(prompt=full_prompt)
-        return response
-    
-    def generate_test_cases(self, code: str) -> str:
-        """Generate test cases for given code"""
-        model = Model(
+        self.model_pool = ModelPool(
+            self._create_model,
+            size=int(os.getenv("IBM_MODEL_POOL_SIZE", os.getenv("IBM_MAX_CONCURRENCY", "32"))),
+            # IAM tokens live for an hour; rebuild clients well before that
+            refresh_after=float(os.getenv("IBM_TOKEN_REFRESH_SECONDS", "3000"))
+        )
+
+    def _create_model(self):
+        return Model(
             model_id=self.model_id,
             params=self.parameters,
             credentials=self.credentials,
             project_id=self.project_id
         )
-        
-        full_prompt = f"""You are a test case generation assistant. Generate comprehensive test cases.
 
-Code:
-{code}
+    def parameters_for(self, task: str) -> dict:
+        """Generation parameters for a task, including any per-task overrides"""
+        return {**self.parameters, **self.task_parameters.get(task, {})}
 
-Generate test cases in a clear format with test case name, input, expected output, and test type:"""
-        
-        response = model.generate_text(prompt=full_prompt)
-        return response
-    
-    def fix_bug(self, code: str, bug_description: str) -> str:
-        """Fix bugs in the provided code"""
-        model = Model(
-            model_id=self.model_id,
-            params=self.parameters,
-            credentials=self.credentials,
-            project_id=self.project_id
+    def request_key(self, task: str, **inputs) -> str:
+        """Response cache key for a task; requests that normalize the same share it"""
+        return response_cache.make_key(
+            self.model_id, task, PROMPT_TEMPLATES[task], inputs, self.parameters_for(task)
         )
-        
-        full_prompt = f"""You are a bug fixing assistant. Fix the bug and explain the fix.
 
-Code with Bug:
-{code}
+    def generate(self, task: str, use_cache: bool = True, on_upstream=None, **inputs) -> str:
+        """Render the task's prompt template and generate, consulting the response cache.
 
-Bug Description: {bug_description}
+        on_upstream is called before a request actually goes to Granite.
+        """
+        params = self.parameters_for(task)
+        template = PROMPT_TEMPLATES[task]
+        inputs, truncated = token_budgeter.fit(task, inputs)
+        # Only greedy decoding is deterministic enough to serve from cache
+        cacheable = params.get(GenParams.DECODING_METHOD) == "greedy"
+        key = self.request_key(task, **inputs)
 
-Provide the fixed code and explanation:"""
-        
-        response = model.generate_text(prompt=full_prompt)
+        if cacheable and use_cache:
+            cached = response_cache.get(key)
+            if cached is not None:
+                return cached
+
+        if on_upstream is not None:
+            on_upstream()
+        prompt = template.format(**inputs)
+        with self.model_pool.acquire() as model:
+            response = model.generate_text(prompt=prompt, params=params)
+        token_budgeter.record(task, prompt, response, truncated)
+
+        if cacheable:
+            response_cache.set(key, task, response)
         return response
-    
-    def requirements_to_code(self, requirements: str) -> dict:
-        """Generate documentation, code, and test cases from requirements"""
-        model = Model(
-            model_id=self.model_id,
-            params=self.parameters,
-            credentials=self.credentials,
-            project_id=self.project_id
-        )
-        
-        # Generate documentation
-        doc_prompt = f"""Generate project documentation for the following requirements:
 
-Requirements: {requirements}
+    def generate_stream(self, task: str, use_cache: bool = True, on_upstream=None, **inputs):
+        """Yield the task's response in chunks as Granite produces them.
 
-Provide: Project Overview, Architecture, Components, and Implementation Plan"""
-        
-        documentation = model.generate_text(prompt=doc_prompt)
-        
-        # Generate code
-        code_prompt = f"""Generate complete code implementation for:
+        A cached response is yielded as a single chunk; a completed stream is
+        written back to the cache. on_upstream is called as for generate().
+        """
+        params = self.parameters_for(task)
+        template = PROMPT_TEMPLATES[task]
+        inputs, truncated = token_budgeter.fit(task, inputs)
+        cacheable = params.get(GenParams.DECODING_METHOD) == "greedy"
+        key = self.request_key(task, **inputs)
 
-Requirements: {requirements}
+        if cacheable and use_cache:
+            cached = response_cache.get(key)
+            if cached is not None:
+                yield cached
+                return
 
-Provide clean, production-ready code:"""
-        
-        code = model.generate_text(prompt=code_prompt)
-        
-        # Generate test cases
-        test_prompt = f"""Generate comprehensive test cases for:
+        if on_upstream is not None:
+            on_upstream()
+        chunks = []
+        prompt = template.format(**inputs)
+        with self.model_pool.acquire() as model:
+            for chunk in model.generate_text_stream(prompt=prompt, params=params):
+                chunks.append(chunk)
+                yield chunk
+        response = "".join(chunks)
+        token_budgeter.record(task, prompt, response, truncated)
 
-Requirements: {requirements}
+        if cacheable:
+            response_cache.set(key, task, response)
 
-Code:
-{code}
+    def generate_code(self, prompt: str, use_cache: bool = True) -> str:
+        """Generate code based on user prompt"""
+        return self.generate("code", use_cache, prompt=prompt)
 
-Provide detailed test cases:"""
-        
-        test_cases = model.generate_text(prompt=test_prompt)
-        
-        return {
-            "documentation": documentation,
-            "code": code,
-            "test_cases": test_cases
-        }
-    
-    def generate_uml(self, requirements: str) -> str:
-        """Generate UML diagram description"""
-        model = Model(
-            model_id=self.model_id,
-            params=self.parameters,
-            credentials=self.credentials,
-            project_id=self.project_id
-        )
-        
-        full_prompt = f"""Generate a PlantUML code for class diagram based on:
+    def generate_test_cases(self, code: str, use_cache: bool = True) -> str:
+        """Generate test cases for given code"""
+        return self.generate("test_cases", use_cache, code=code)
 
-Requirements: {requirements}
+    def fix_bug(self, code: str, bug_description: str, use_cache: bool = True) -> str:
+        """Fix bugs in the provided code"""
+        return self.generate("bug_fix", use_cache, code=code, bug_description=bug_description)
 
-Provide only PlantUML code starting with @startuml and ending with @enduml:"""
-        
-        response = model.generate_text(prompt=full_prompt)
-        return response
+    def generate_documentation(self, requirements: str, use_cache: bool = True) -> str:
+        """Generate project documentation from requirements"""
+        return self.generate("documentation", use_cache, requirements=requirements)
+
+    def generate_implementation(self, requirements: str, use_cache: bool = True) -> str:
+        """Generate a code implementation from requirements"""
+        return self.generate("implementation", use_cache, requirements=requirements)
+
+    def generate_requirement_tests(self, requirements: str, code: str, use_cache: bool = True) -> str:
+        """Generate test cases for code implementing the given requirements"""
+        return self.generate("requirement_tests", use_cache, requirements=requirements, code=code)
+
+    def generate_uml(self, requirements: str, use_cache: bool = True) -> str:
+        """Generate UML diagram description"""
+        return self.generate("uml", use_cache, requirements=requirements)
 
-ibm_service = IBMService()
\ No newline at end of file
+ibm_service = IBMService()
+metrics_registry.register("granite_model_pool", ibm_service.model_pool.stats)
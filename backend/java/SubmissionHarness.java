@@ -0,0 +1,74 @@
+import java.io.BufferedReader;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.File;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.util.Base64;
+
+/**
+ * Runs a compiled submission's main method once per test input inside a single JVM.
+ *
+ * Usage: java -cp <harness dir> SubmissionHarness <class dir> <class name> <protocol path>
+ *
+ * The first stdin line is a nonce; each later line is a base64-encoded test
+ * input. For every input the harness loads the submission in a fresh class
+ * loader (so static state does not leak between cases), points
+ * System.in/out/err at in-memory streams, invokes main, and writes
+ * "<nonce> RESULT <status> <base64 stdout> <base64 stderr>" to the protocol
+ * path (a pipe from the runner). The submission can reach the real stdout but
+ * never learns the nonce, so it cannot forge a result.
+ */
+public class SubmissionHarness {
+    public static void main(String[] args) throws Exception {
+        URL[] classpath = { new File(args[0]).toURI().toURL() };
+        String className = args[1];
+
+        PrintStream protocol = new PrintStream(new FileOutputStream(args[2]), true, "UTF-8");
+        BufferedReader requests = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        Base64.Decoder decoder = Base64.getDecoder();
+        Base64.Encoder encoder = Base64.getEncoder();
+        String nonce = requests.readLine();
+        if (nonce == null) {
+            return;
+        }
+
+        String line;
+        while ((line = requests.readLine()) != null) {
+            byte[] input = decoder.decode(line.trim());
+            ByteArrayOutputStream out = new ByteArrayOutputStream();
+            ByteArrayOutputStream err = new ByteArrayOutputStream();
+            PrintStream outStream = new PrintStream(out, true, "UTF-8");
+            PrintStream errStream = new PrintStream(err, true, "UTF-8");
+
+            System.setIn(new ByteArrayInputStream(input));
+            System.setOut(outStream);
+            System.setErr(errStream);
+
+            int status = 0;
+            try (URLClassLoader loader = new URLClassLoader(classpath, ClassLoader.getPlatformClassLoader())) {
+                Method main = loader.loadClass(className).getMethod("main", String[].class);
+                main.invoke(null, (Object) new String[0]);
+            } catch (InvocationTargetException e) {
+                errStream.print("Exception in thread \"main\" ");
+                e.getCause().printStackTrace(errStream);
+                status = 1;
+            } catch (Throwable e) {
+                e.printStackTrace(errStream);
+                status = 1;
+            }
+
+            outStream.flush();
+            errStream.flush();
+            protocol.println(nonce + " RESULT " + status + " "
+                    + encoder.encodeToString(out.toByteArray()) + " "
+                    + encoder.encodeToString(err.toByteArray()));
+        }
+    }
+}
@@ -0,0 +1,382 @@
+import os
+import re
+import time
+import fcntl
+import base64
+import shutil
+import hashlib
+import secrets
+import selectors
+import subprocess
+import tempfile
+import threading
+from dotenv import load_dotenv
+
+from metrics import metrics_registry
+
+load_dotenv()
+
+HARNESS_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "java", "SubmissionHarness.java")
+# Shared-locked by every run using a class directory; eviction needs it exclusively
+IN_USE_FILE = ".in-use"
+
+class CompileError(Exception):
+    pass
+
+class JavaClassCache:
+    """Compiled submissions on disk, keyed by a hash of the source.
+
+    Identical sources share one class directory, so a submission is compiled
+    once no matter how many test cases (or resubmissions) run against it.
+    Callers hold a shared flock on the directory's in-use file while they
+    run it, so eviction (from any worker process) skips it.
+    """
+
+    def __init__(self, root: str, max_entries: int):
+        self.root = root
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._hits = 0
+        self._compiles = 0
+        self._compile_failures = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _hold(class_dir: str):
+        """Shared-lock an existing class directory; None if it is missing or was just evicted"""
+        in_use = os.path.join(class_dir, IN_USE_FILE)
+        try:
+            fd = os.open(in_use, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        if not os.path.exists(in_use):
+            os.close(fd)
+            return None
+        os.utime(class_dir)
+        return fd
+
+    def acquire(self, source: str, file_name: str, prefix: str = "submission"):
+        """Return (class_dir, hold) for source, compiling if needed; pass hold to release() when done"""
+        key = hashlib.sha256(source.encode()).hexdigest()
+        class_dir = os.path.join(self.root, f"{prefix}-{key}")
+        with self._key_lock(key):
+            hold = self._hold(class_dir)
+            if hold is not None:
+                with self._lock:
+                    self._hits += 1
+                return class_dir, hold
+
+            build_dir = tempfile.mkdtemp(dir=self.root, prefix="build-")
+            hold = None
+            try:
+                # Locked before the rename so eviction can never see it unheld
+                hold = os.open(os.path.join(build_dir, IN_USE_FILE), os.O_RDONLY | os.O_CREAT, 0o644)
+                fcntl.flock(hold, fcntl.LOCK_SH)
+                java_file = os.path.join(build_dir, file_name)
+                with open(java_file, 'w') as f:
+                    f.write(source)
+                result = subprocess.run(
+                    ['javac', '-d', build_dir, java_file],
+                    capture_output=True,
+                    text=True,
+                    timeout=10
+                )
+                if result.returncode != 0:
+                    with self._lock:
+                        self._compile_failures += 1
+                    raise CompileError(result.stderr)
+                os.unlink(java_file)
+                # Left over from an interrupted eviction, or from before in-use files existed
+                shutil.rmtree(class_dir, ignore_errors=True)
+                os.replace(build_dir, class_dir)
+            except BaseException:
+                if hold is not None:
+                    os.close(hold)
+                shutil.rmtree(build_dir, ignore_errors=True)
+                raise
+            with self._lock:
+                self._compiles += 1
+
+        self._evict()
+        return class_dir, hold
+
+    @staticmethod
+    def release(hold: int):
+        os.close(hold)
+
+    def _evict(self):
+        """Remove the least recently used class directories beyond max_entries that no run holds"""
+        entries = [
+            os.path.join(self.root, name) for name in os.listdir(self.root)
+            if not name.startswith("build-") and not name.startswith("harness-")
+        ]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda path: os.path.getmtime(path))
+        for path in entries[:len(entries) - self.max_entries]:
+            in_use = os.path.join(path, IN_USE_FILE)
+            try:
+                fd = os.open(in_use, os.O_RDONLY)
+            except FileNotFoundError:
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            try:
+                # Unlinked first so a run waiting on the lock sees the entry is gone
+                os.unlink(in_use)
+                shutil.rmtree(path, ignore_errors=True)
+            finally:
+                os.close(fd)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "compiles": self._compiles,
+                "compile_failures": self._compile_failures
+            }
+
+class JavaHarness:
+    """A JVM running SubmissionHarness for one compiled submission"""
+
+    def __init__(self, harness_dir: str, class_dir: str, class_name: str):
+        # Results come back on a pipe of their own rather than stdout, tagged
+        # with a nonce the submission never sees, so it can't forge a verdict
+        self.nonce = secrets.token_hex(16)
+        protocol_read, protocol_write = os.pipe()
+        try:
+            self.process = subprocess.Popen(
+                ['java', '-cp', harness_dir, 'SubmissionHarness', class_dir, class_name, f"/dev/fd/{protocol_write}"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                pass_fds=(protocol_write,),
+                bufsize=0
+            )
+        except BaseException:
+            os.close(protocol_read)
+            raise
+        finally:
+            os.close(protocol_write)
+        self._protocol = protocol_read
+        self._buffer = b""
+        try:
+            self.process.stdin.write(self.nonce.encode() + b"\n")
+        except OSError:
+            # The JVM died on startup
+            self.kill()
+            raise
+
+    def run(self, test_input: str, timeout: float) -> dict:
+        """Run one case; raises TimeoutError, EOFError or ValueError if the JVM hangs, exits or misbehaves"""
+        self.process.stdin.write(base64.b64encode(test_input.encode()) + b"\n")
+        deadline = time.monotonic() + timeout
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._protocol, selectors.EVENT_READ)
+            while b"\n" not in self._buffer:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not selector.select(remaining):
+                    raise TimeoutError("Execution timed out")
+                chunk = os.read(self._protocol, 65536)
+                if not chunk:
+                    raise EOFError("Harness exited")
+                self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        nonce, tag, status, out, err = line.decode().split(" ")
+        if not secrets.compare_digest(nonce, self.nonce) or tag != "RESULT":
+            raise ValueError("Harness sent an unexpected frame")
+        return {
+            "success": status == "0",
+            "output": base64.b64decode(out).decode(errors="replace"),
+            "error": base64.b64decode(err).decode(errors="replace")
+        }
+
+    def _close_protocol(self):
+        if self._protocol is not None:
+            os.close(self._protocol)
+            self._protocol = None
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=1)
+        except Exception:
+            self.process.kill()
+        self._close_protocol()
+
+    def kill(self):
+        self.process.kill()
+        try:
+            self.process.wait(timeout=1)
+        except Exception:
+            pass
+        self._close_protocol()
+
+class JavaRunner:
+    """Compile a Java submission once and run every test case against it"""
+
+    def __init__(self, class_cache: JavaClassCache, use_harness: bool):
+        self.class_cache = class_cache
+        self.use_harness = use_harness
+        self._harness_dir = None
+        self._lock = threading.Lock()
+        self._harness_fallbacks = 0
+
+    def harness_dir(self) -> str:
+        if self._harness_dir is None:
+            with self._lock:
+                if self._harness_dir is None:
+                    with open(HARNESS_SOURCE) as f:
+                        source = f.read()
+                    # Held for the life of the process
+                    self._harness_dir, _ = self.class_cache.acquire(
+                        source, "SubmissionHarness.java", prefix="harness"
+                    )
+        return self._harness_dir
+
+    @staticmethod
+    def class_name(code: str):
+        class_match = re.search(r'public\s+class\s+(\w+)', code)
+        return class_match.group(1) if class_match else None
+
+    @staticmethod
+    def run_cold(class_dir: str, class_name: str, test_input: str, timeout: float) -> dict:
+        """Run one case in a fresh JVM"""
+        try:
+            run_result = subprocess.run(
+                ['java', '-cp', class_dir, class_name],
+                input=test_input,
+                capture_output=True,
+                text=True,
+                timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            return {
+                "success": False,
+                "output": "",
+                "error": "Execution timed out"
+            }
+        except OSError as e:
+            return {
+                "success": False,
+                "output": "",
+                "error": f"Could not start java: {e}"
+            }
+        return {
+            "success": run_result.returncode == 0,
+            "output": run_result.stdout,
+            "error": run_result.stderr
+        }
+
+    def prepare(self, code: str):
+        """Compile code; returns (class_dir, class_name, hold) or an error result dict"""
+        class_name = self.class_name(code)
+        if not class_name:
+            return {
+                "success": False,
+                "output": "",
+                "error": "Could not find public class declaration"
+            }
+        try:
+            return (*self.class_cache.acquire(code, f"{class_name}.java"), class_name)
+        except CompileError as e:
+            return {
+                "success": False,
+                "output": "",
+                "error": f"Compilation error: {e}"
+            }
+
+    def run_all(self, code: str, inputs: list, timeout: float = 5, keep_going=None) -> list:
+        """Return one result per input, compiling once and reusing one JVM where possible.
+
+        If keep_going is given it is called with each result as it lands;
+        returning False stops the run and only the results so far are returned.
+        """
+        try:
+            prepared = self.prepare(code)
+        except Exception as e:
+            prepared = {"success": False, "output": "", "error": str(e)}
+        if isinstance(prepared, dict):
+            results = []
+            for _ in inputs:
+                results.append(dict(prepared))
+                if keep_going is not None and not keep_going(results[-1]):
+                    break
+            return results
+        class_dir, hold, class_name = prepared
+
+        results = []
+        harness = None
+        cold = not self.use_harness
+        try:
+            for test_input in inputs:
+                started = time.perf_counter()
+                if not cold and harness is None:
+                    try:
+                        harness = JavaHarness(self.harness_dir(), class_dir, class_name)
+                    except Exception:
+                        # The harness failed to compile or java could not be
+                        # launched; run_cold reports the latter per case
+                        cold = True
+                        self._count_fallback()
+                if cold:
+                    results.append(self.run_cold(class_dir, class_name, test_input, timeout))
+                else:
+                    try:
+                        results.append(harness.run(test_input, timeout))
+                    except TimeoutError:
+                        harness.kill()
+                        harness = None
+                        results.append({
+                            "success": False,
+                            "output": "",
+                            "error": "Execution timed out"
+                        })
+                    except (EOFError, OSError, ValueError):
+                        # The submission called System.exit (or the JVM died), which
+                        # takes the harness with it; run this and later cases cold.
+                        harness.kill()
+                        harness = None
+                        cold = True
+                        self._count_fallback()
+                        results.append(self.run_cold(class_dir, class_name, test_input, timeout))
+                results[-1]["wall_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                if keep_going is not None and not keep_going(results[-1]):
+                    break
+        finally:
+            if harness is not None:
+                harness.close()
+            self.class_cache.release(hold)
+        return results
+
+    def _count_fallback(self):
+        with self._lock:
+            self._harness_fallbacks += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            fallbacks = self._harness_fallbacks
+        return {
+            **self.class_cache.stats(),
+            "use_harness": self.use_harness,
+            "harness_fallbacks": fallbacks
+        }
+
+java_runner = JavaRunner(
+    JavaClassCache(
+        root=os.getenv("JAVA_CLASS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "sdlc_java_classes")),
+        max_entries=int(os.getenv("JAVA_CLASS_CACHE_MAX_ENTRIES", "256"))
+    ),
+    use_harness=os.getenv("JAVA_USE_HARNESS", "true").lower() == "true"
+)
+metrics_registry.register("java_runner", java_runner.stats)
@@ -0,0 +1,311 @@
+import os
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from ibm_service import ibm_service
+from gemini_service import gemini_service, is_error_response, ERROR_PREFIX
+from semantic_cache import voice_cache
+from topic_filter import topic_filter, OFF_TOPIC_REFUSAL
+from text_features import normalize
+from single_flight import SingleFlight
+from admission import admission
+from metrics import Histogram, metrics_registry
+
+load_dotenv()
+
+class ProviderPool:
+    """Bounded thread pool that runs blocking SDK calls for one LLM provider off the event loop"""
+
+    def __init__(self, name: str, max_concurrency: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix=f"llm-{name}"
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self._completed = 0
+        self._failed = 0
+        self.queue_wait = Histogram()
+        self.latency = Histogram()
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking call in this provider's pool and await its result"""
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+
+        def call():
+            started = time.perf_counter()
+            with self._lock:
+                self._waiting -= 1
+                self._in_flight += 1
+            self.queue_wait.observe((started - submitted) * 1000)
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self._failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._completed += 1
+                self.latency.observe((time.perf_counter() - started) * 1000)
+            return result
+
+        return await loop.run_in_executor(self._executor, call)
+
+    async def stream(self, gen_func, *args, **kwargs):
+        """Iterate a blocking generator in this provider's pool, yielding its items as they arrive"""
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        stopped = threading.Event()
+        done = object()
+
+        def pump():
+            generator = gen_func(*args, **kwargs)
+            try:
+                for item in generator:
+                    if stopped.is_set():
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, item)
+            except Exception as e:
+                loop.call_soon_threadsafe(items.put_nowait, e)
+            finally:
+                generator.close()
+            loop.call_soon_threadsafe(items.put_nowait, done)
+
+        future = asyncio.ensure_future(self.run(pump))
+        try:
+            while True:
+                item = await items.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            await future
+        finally:
+            # Let the worker thread close the upstream stream if the client went away
+            stopped.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "completed": self._completed,
+                "failed": self._failed
+            }
+        counters["queue_wait"] = self.queue_wait.snapshot()
+        counters["latency"] = self.latency.snapshot()
+        return counters
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+class AsyncIBMClient:
+    """Async facade over IBMService; every generation runs in the IBM provider pool.
+
+    Identical requests in flight at the same time share one generation.
+    """
+
+    def __init__(self, service, pool: ProviderPool, flights: SingleFlight):
+        self.service = service
+        self.pool = pool
+        self.flights = flights
+
+    async def _run(self, task: str, use_cache: bool, **inputs) -> str:
+        key = (self.service.request_key(task, **inputs), use_cache)
+        # The caller that starts the generation is charged for it; waiters are not
+        return await self.flights.run(key, lambda: self.pool.run(
+            self.service.generate, task, use_cache, admission.upstream_charger(), **inputs
+        ))
+
+    async def generate_code(self, prompt: str, use_cache: bool = True) -> str:
+        return await self._run("code", use_cache, prompt=prompt)
+
+    async def generate_test_cases(self, code: str, use_cache: bool = True) -> str:
+        return await self._run("test_cases", use_cache, code=code)
+
+    async def fix_bug(self, code: str, bug_description: str, use_cache: bool = True) -> str:
+        return await self._run("bug_fix", use_cache, code=code, bug_description=bug_description)
+
+    async def requirements_to_code_stages(self, requirements: str, use_cache: bool = True):
+        """Yield (stage, result) pairs as each stage finishes.
+
+        Documentation and code generate concurrently; test cases start as soon
+        as the code lands. A failed stage is yielded with its exception as the
+        result, and test cases are skipped if the code stage fails.
+        """
+        async def stage(name, task, **inputs):
+            try:
+                return name, await self._run(task, use_cache, **inputs)
+            except Exception as e:
+                return name, e
+
+        pending = {
+            asyncio.ensure_future(stage("documentation", "documentation", requirements=requirements)),
+            asyncio.ensure_future(stage("code", "implementation", requirements=requirements))
+        }
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name, result = task.result()
+                    if name == "code" and not isinstance(result, Exception):
+                        pending.add(asyncio.ensure_future(stage(
+                            "test_cases", "requirement_tests", requirements=requirements, code=result
+                        )))
+                    yield name, result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def requirements_to_code(self, requirements: str, use_cache: bool = True) -> dict:
+        result = {}
+        async for stage, value in self.requirements_to_code_stages(requirements, use_cache):
+            if isinstance(value, Exception):
+                raise value
+            result[stage] = value
+        return {
+            "documentation": result["documentation"],
+            "code": result["code"],
+            "test_cases": result["test_cases"]
+        }
+
+    async def generate_uml(self, requirements: str, use_cache: bool = True) -> str:
+        return await self._run("uml", use_cache, requirements=requirements)
+
+    def stream(self, task: str, use_cache: bool = True, **inputs):
+        """Async generator of response chunks for a single-prompt task"""
+        key = (self.service.request_key(task, **inputs), use_cache)
+        return self.flights.stream(
+            key, lambda: self.pool.stream(
+                self.service.generate_stream, task, use_cache, admission.upstream_charger(), **inputs
+            )
+        )
+
+    async def requirements_to_code_stream(self, requirements: str, use_cache: bool = True):
+        """Yield (stage, chunk) pairs while documentation, code and tests stream.
+
+        Documentation and code stream concurrently; test cases start streaming
+        once the code is complete. Each stage ends with a (stage, None) pair,
+        and a failed stage yields its exception as the chunk.
+        """
+        events = asyncio.Queue()
+
+        async def run_stage(stage, **inputs):
+            chunks = []
+            try:
+                async for chunk in self.stream(stage_tasks[stage], use_cache, **inputs):
+                    chunks.append(chunk)
+                    await events.put((stage, chunk))
+            except Exception as e:
+                await events.put((stage, e))
+                return None
+            await events.put((stage, None))
+            return "".join(chunks)
+
+        async def code_then_tests():
+            code = await run_stage("code", requirements=requirements)
+            if code is not None:
+                await run_stage("test_cases", requirements=requirements, code=code)
+            else:
+                await events.put(("test_cases", None))
+
+        stage_tasks = {
+            "documentation": "documentation",
+            "code": "implementation",
+            "test_cases": "requirement_tests"
+        }
+        tasks = [
+            asyncio.ensure_future(run_stage("documentation", requirements=requirements)),
+            asyncio.ensure_future(code_then_tests())
+        ]
+        try:
+            finished = 0
+            while finished < len(stage_tasks):
+                stage, chunk = await events.get()
+                if chunk is None or isinstance(chunk, Exception):
+                    finished += 1
+                yield stage, chunk
+        finally:
+            for task in tasks:
+                task.cancel()
+
+class AsyncGeminiClient:
+    """Async facade over GeminiService; every call runs in the Gemini provider pool.
+
+    Questions that normalize to the same text while one is in flight share its answer.
+    """
+
+    def __init__(self, service, pool: ProviderPool, flights: SingleFlight):
+        self.service = service
+        self.pool = pool
+        self.flights = flights
+
+    async def _answer(self, text: str) -> str:
+        await admission.charge_current()
+        response = await self.pool.run(self.service.get_voice_response, text)
+        if not is_error_response(response):
+            await asyncio.to_thread(voice_cache.store, text, response)
+        return response
+
+    async def _answer_stream(self, text: str):
+        await admission.charge_current()
+        chunks = []
+        try:
+            async for chunk in self.pool.stream(self.service.get_voice_response_stream, text):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            # The client gets the error after whatever arrived; a cut-off answer is never cached
+            yield ERROR_PREFIX + str(e)
+            return
+        await asyncio.to_thread(voice_cache.store, text, "".join(chunks))
+
+    async def get_voice_response(self, text: str, use_cache: bool = True) -> str:
+        if topic_filter.is_off_topic(text):
+            return OFF_TOPIC_REFUSAL
+        if use_cache:
+            cached = await asyncio.to_thread(voice_cache.lookup, text)
+            if cached is not None:
+                return cached[0]
+        return await self.flights.run(normalize(text), lambda: self._answer(text))
+
+    async def get_voice_response_stream(self, text: str, use_cache: bool = True):
+        """Yield response chunks; refusals and near-duplicate questions arrive as one chunk"""
+        if topic_filter.is_off_topic(text):
+            yield OFF_TOPIC_REFUSAL
+            return
+        if use_cache:
+            cached = await asyncio.to_thread(voice_cache.lookup, text)
+            if cached is not None:
+                yield cached[0]
+                return
+        async for chunk in self.flights.stream(normalize(text), lambda: self._answer_stream(text)):
+            yield chunk
+
+ibm_pool = ProviderPool("ibm", int(os.getenv("IBM_MAX_CONCURRENCY", "32")))
+gemini_pool = ProviderPool("gemini", int(os.getenv("GEMINI_MAX_CONCURRENCY", "32")))
+
+single_flight_enabled = os.getenv("LLM_SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+ibm_flights = SingleFlight("ibm", single_flight_enabled)
+gemini_flights = SingleFlight("gemini", single_flight_enabled)
+
+ibm_client = AsyncIBMClient(ibm_service, ibm_pool, ibm_flights)
+gemini_client = AsyncGeminiClient(gemini_service, gemini_pool, gemini_flights)
+
+metrics_registry.register("llm_ibm_pool", ibm_pool.stats)
+metrics_registry.register("llm_gemini_pool", gemini_pool.stats)
+metrics_registry.register("llm_ibm_single_flight", ibm_flights.stats)
+metrics_registry.register("llm_gemini_single_flight", gemini_flights.stats)
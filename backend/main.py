@@ -1,31 +1,48 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Form
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Form, WebSocket, WebSocketDisconnect
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from datetime import timedelta
+from datetime import datetime, timedelta
 from typing import Optional
 import json
-from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Preformatted
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
+import math
+import time
+import asyncio
 import base64
 
-from database import get_db, init_db
-from models import User, History, CodingProblem, ChallengeAttempt
+from database import get_db, init_db, SessionLocal, engine
+from migrations import run_migrations
+from models import User, History, CodingProblem
 from auth import (
-    get_password_hash,
-    verify_password,
+    password_hasher,
     create_access_token,
     get_current_user,
+    get_current_admin,
+    user_from_token,
+    Principal,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from ibm_service import ibm_service
-from gemini_service import gemini_service
-from code_executor import code_executor
+from llm_client import ibm_client, gemini_client, ibm_pool, gemini_pool
+from metrics import metrics_registry
+from semantic_cache import voice_cache
+from sandbox_pool import sandbox_pool
+from grading_queue import grading_queue, grade_submission, QueueFull
+from user_stats import load_user_stats
+from history_store import load_texts, format_history
+from pdf_export import render_pdf, iter_file, pdf_filename
+from history_export import (
+    export_filename,
+    export_manager,
+    EXPORT_FORMATS,
+    ENTRY_FORMATS
+)
+from history_writer import history_writer
+from admission import admission, AdmissionDenied, current_lease
 
 app = FastAPI(title="SDLC Assistant Platform")
 
@@ -39,6 +56,7 @@ templates = Jinja2Templates(directory=os.path.join(base_dir, "frontend/templates
 @app.on_event("startup")
 def startup_event():
     init_db()
+    run_migrations(engine)
     # Add sample coding problems
     db = next(get_db())
     if db.query(CodingProblem).count() == 0:
@@ -81,6 +99,38 @@ def startup_event():
             db.add(problem)
         db.commit()
     db.close()
+    sandbox_pool.warm()
+    grading_queue.start()
+    history_writer.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    grading_queue.stop()
+    history_writer.stop()
+    password_hasher.shutdown()
+    export_manager.shutdown()
+    ibm_pool.shutdown()
+    gemini_pool.shutdown()
+    sandbox_pool.shutdown()
+
+@app.exception_handler(AdmissionDenied)
+async def admission_denied(request: Request, exc: AdmissionDenied):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))}
+    )
+
+def client_subject(request: Request) -> str:
+    """Rate limit key for endpoints that don't require a login"""
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+async def save_history(user_id: int, request_type: str, input_text: str, output_text: str):
+    """Hand a history record to the write-behind logger, writing it here if the queue is full"""
+    if not history_writer.submit(user_id, request_type, input_text, output_text):
+        await run_in_threadpool(
+            history_writer.write, [(user_id, request_type, input_text, output_text)], True
+        )
 
 # Authentication endpoints
 @app.post("/register")
@@ -97,7 +147,7 @@ async def register(
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(password)
+    hashed_password = await password_hasher.hash(password)
     user = User(username=username, email=email, hashed_password=hashed_password)
     db.add(user)
     db.commit()
@@ -109,8 +159,17 @@ async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
+    started = time.perf_counter()
     user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    valid = False
+    if user:
+        valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+        if valid and new_hash:
+            # BCRYPT_ROUNDS changed since this hash was made
+            user.hashed_password = new_hash
+            db.commit()
+    password_hasher.observe_login((time.perf_counter() - started) * 1000)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -118,7 +177,7 @@ async def login(
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id}, expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
@@ -152,119 +211,254 @@ async def history_page(request: Request):
 @app.post("/api/generate-code")
 async def generate_code(
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user)
 ):
     data = await request.json()
     prompt = data.get("prompt")
+    use_cache = not data.get("bypass_cache", False)
     
-    result = ibm_service.generate_code(prompt)
+    async with admission.slot("llm", current_user.id):
+        result = await ibm_client.generate_code(prompt, use_cache)
     
-    # Save to history
-    history = History(
-        user_id=current_user.id,
-        request_type="code_generation",
-        input_text=prompt,
-        output_text=result
-    )
-    db.add(history)
-    db.commit()
+    await save_history(current_user.id, "code_generation", prompt, result)
     
     return {"result": result}
 
 @app.post("/api/generate-test-cases")
 async def generate_test_cases(
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user)
 ):
     data = await request.json()
     code = data.get("code")
+    use_cache = not data.get("bypass_cache", False)
     
-    result = ibm_service.generate_test_cases(code)
+    async with admission.slot("llm", current_user.id):
+        result = await ibm_client.generate_test_cases(code, use_cache)
     
-    history = History(
-        user_id=current_user.id,
-        request_type="test_cases",
-        input_text=code,
-        output_text=result
-    )
-    db.add(history)
-    db.commit()
+    await save_history(current_user.id, "test_cases", code, result)
     
     return {"result": result}
 
 @app.post("/api/fix-bug")
 async def fix_bug(
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user)
 ):
     data = await request.json()
     code = data.get("code")
     bug_description = data.get("bug_description")
+    use_cache = not data.get("bypass_cache", False)
     
-    result = ibm_service.fix_bug(code, bug_description)
+    async with admission.slot("llm", current_user.id):
+        result = await ibm_client.fix_bug(code, bug_description, use_cache)
     
-    history = History(
-        user_id=current_user.id,
-        request_type="bug_fix",
-        input_text=f"Code: {code}\nBug: {bug_description}",
-        output_text=result
-    )
-    db.add(history)
-    db.commit()
+    await save_history(current_user.id, "bug_fix", f"Code: {code}\nBug: {bug_description}", result)
     
     return {"result": result}
 
 @app.post("/api/requirements-to-code")
 async def requirements_to_code(
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user)
 ):
     data = await request.json()
     requirements = data.get("requirements")
+    use_cache = not data.get("bypass_cache", False)
     
-    result = ibm_service.requirements_to_code(requirements)
+    async with admission.slot("llm", current_user.id, cost=3):
+        result = await ibm_client.requirements_to_code(requirements, use_cache)
     
-    history = History(
-        user_id=current_user.id,
-        request_type="requirements_to_code",
-        input_text=requirements,
-        output_text=json.dumps(result)
-    )
-    db.add(history)
-    db.commit()
+    await save_history(current_user.id, "requirements_to_code", requirements, json.dumps(result))
     
     return result
 
 @app.post("/api/generate-uml")
 async def generate_uml(
     request: Request,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     data = await request.json()
     requirements = data.get("requirements")
+    use_cache = not data.get("bypass_cache", False)
     
-    uml_code = ibm_service.generate_uml(requirements)
+    async with admission.slot("llm", current_user.id):
+        uml_code = await ibm_client.generate_uml(requirements, use_cache)
     
     return {"uml_code": uml_code}
 
+# Streaming (Server-Sent Events) variants of the SDLC tool endpoints
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def release_after(events, lease):
+    """Yield from events, charging upstream calls to the lease and releasing it however the stream ends"""
+    current_lease.set(lease)
+    try:
+        async for event in events:
+            yield event
+    finally:
+        await admission.release(lease)
+
+def sse_response(events, lease=None) -> StreamingResponse:
+    """SSE response holding an admission lease until the stream ends, fails or the client leaves"""
+    if lease:
+        events = release_after(events, lease)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Covers a client that leaves before the stream starts; release() is idempotent
+        background=BackgroundTask(lease.release) if lease else None
+    )
+
+def stream_task(task: str, inputs: dict, use_cache: bool, lease, on_complete=None) -> StreamingResponse:
+    """Stream one generation as token events, then call on_complete with the full text"""
+    async def events():
+        chunks = []
+        try:
+            async for chunk in ibm_client.stream(task, use_cache, **inputs):
+                chunks.append(chunk)
+                yield sse_event("token", {"text": chunk})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        if on_complete:
+            await on_complete("".join(chunks))
+        yield sse_event("done", {})
+
+    return sse_response(events(), lease)
+
+@app.post("/api/generate-code/stream")
+async def generate_code_stream(
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
+):
+    data = await request.json()
+    prompt = data.get("prompt")
+    use_cache = not data.get("bypass_cache", False)
+    user_id = current_user.id
+    lease = await admission.acquire("llm", user_id)
+
+    return stream_task(
+        "code", {"prompt": prompt}, use_cache, lease,
+        lambda result: save_history(user_id, "code_generation", prompt, result)
+    )
+
+@app.post("/api/generate-test-cases/stream")
+async def generate_test_cases_stream(
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
+):
+    data = await request.json()
+    code = data.get("code")
+    use_cache = not data.get("bypass_cache", False)
+    user_id = current_user.id
+    lease = await admission.acquire("llm", user_id)
+
+    return stream_task(
+        "test_cases", {"code": code}, use_cache, lease,
+        lambda result: save_history(user_id, "test_cases", code, result)
+    )
+
+@app.post("/api/fix-bug/stream")
+async def fix_bug_stream(
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
+):
+    data = await request.json()
+    code = data.get("code")
+    bug_description = data.get("bug_description")
+    use_cache = not data.get("bypass_cache", False)
+    user_id = current_user.id
+    lease = await admission.acquire("llm", user_id)
+
+    return stream_task(
+        "bug_fix", {"code": code, "bug_description": bug_description}, use_cache, lease,
+        lambda result: save_history(user_id, "bug_fix", f"Code: {code}\nBug: {bug_description}", result)
+    )
+
+@app.post("/api/generate-uml/stream")
+async def generate_uml_stream(
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
+):
+    data = await request.json()
+    requirements = data.get("requirements")
+    use_cache = not data.get("bypass_cache", False)
+
+    lease = await admission.acquire("llm", current_user.id)
+
+    return stream_task("uml", {"requirements": requirements}, use_cache, lease)
+
+@app.post("/api/requirements-to-code/stream")
+async def requirements_to_code_stream(
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
+):
+    data = await request.json()
+    requirements = data.get("requirements")
+    use_cache = not data.get("bypass_cache", False)
+    user_id = current_user.id
+    lease = await admission.acquire("llm", user_id, cost=3)
+
+    async def events():
+        result = {"documentation": [], "code": [], "test_cases": []}
+        failed = False
+        async for stage, chunk in ibm_client.requirements_to_code_stream(requirements, use_cache):
+            if isinstance(chunk, Exception):
+                failed = True
+                yield sse_event("error", {"stage": stage, "detail": str(chunk)})
+            elif chunk is None:
+                yield sse_event("stage_done", {"stage": stage})
+            else:
+                result[stage].append(chunk)
+                yield sse_event("token", {"stage": stage, "text": chunk})
+
+        if not failed:
+            await save_history(user_id, "requirements_to_code", requirements, json.dumps({
+                stage: "".join(chunks) for stage, chunks in result.items()
+            }))
+        yield sse_event("done", {})
+
+    return sse_response(events(), lease)
+
 # Voice assistant endpoint
 @app.post("/api/voice-assistant")
 async def voice_assistant(request: Request):
     data = await request.json()
     text = data.get("text")
     
-    response = gemini_service.get_voice_response(text)
+    use_cache = not data.get("bypass_cache", False)
+    
+    async with admission.slot("voice", client_subject(request)):
+        response = await gemini_client.get_voice_response(text, use_cache)
     
     return {"response": response}
 
+@app.post("/api/voice-assistant/stream")
+async def voice_assistant_stream(request: Request):
+    data = await request.json()
+    text = data.get("text")
+    use_cache = not data.get("bypass_cache", False)
+    lease = await admission.acquire("voice", client_subject(request))
+
+    async def events():
+        async for chunk in gemini_client.get_voice_response_stream(text, use_cache):
+            yield sse_event("token", {"text": chunk})
+        yield sse_event("done", {})
+
+    return sse_response(events(), lease)
+
+@app.delete("/api/admin/voice-cache")
+async def purge_voice_cache(current_user: Principal = Depends(get_current_admin)):
+    return {"purged": voice_cache.purge()}
+
 # Coding challenge endpoints
 @app.get("/api/problems")
 async def get_problems(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     problems = db.query(CodingProblem).all()
@@ -279,7 +473,7 @@ async def get_problems(
 @app.post("/api/execute-code")
 async def execute_code(
     request: Request,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     data = await request.json()
@@ -292,86 +486,141 @@ async def execute_code(
     if not problem:
         raise HTTPException(status_code=404, detail="Problem not found")
     
-    test_cases = json.loads(problem.test_cases)
-    results = []
-    all_passed = True
-    
-    for test_case in test_cases:
-        result = code_executor.execute_code(code, language, test_case.get("input", ""))
-        passed = result["success"] and test_case["output"] in result["output"]
-        results.append({
-            "input": test_case["input"],
-            "expected": test_case["output"],
-            "actual": result["output"],
-            "passed": passed,
-            "error": result.get("error", "")
-        })
-        if not passed:
-            all_passed = False
-    
-    # Save attempt
-    attempt = ChallengeAttempt(
-        user_id=current_user.id,
-        problem_id=problem_id,
-        code=code,
-        language=language,
-        passed=all_passed
-    )
-    db.add(attempt)
-    db.commit()
-    
-    return {"results": results, "all_passed": all_passed}
+    async with admission.slot("grading", current_user.id):
+        return await run_in_threadpool(
+            grade_submission, db, current_user.id, problem, code, language, bool(data.get("fail_fast", False))
+        )
+
+@app.post("/api/submissions")
+async def create_submission(
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    data = await request.json()
+    problem = db.query(CodingProblem).filter(CodingProblem.id == data.get("problem_id")).first()
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    # Queued jobs are paced by the rate limit; the queue itself caps concurrency
+    try:
+        async with admission.slot("grading", current_user.id):
+            job = await run_in_threadpool(
+                grading_queue.submit, db, current_user.id, problem, data.get("code"),
+                data.get("language"), bool(data.get("fail_fast", False))
+            )
+    except QueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Grading queue is full, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+    return {"job_id": job.id, "status": job.status}
+
+def get_owned_job(job_id: str, user: Principal):
+    job = grading_queue.get(job_id)
+    if job is None or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    return job
+
+@app.get("/api/submissions/{job_id}")
+async def get_submission(job_id: str, current_user: Principal = Depends(get_current_user)):
+    return get_owned_job(job_id, current_user).snapshot()
+
+# Seconds a submission socket may wait for the client's token
+WS_AUTH_TIMEOUT_SECONDS = 10
+
+@app.websocket("/ws/submissions/{job_id}")
+async def submission_updates(websocket: WebSocket, job_id: str):
+    # The token arrives as the first message, keeping it out of URLs and access logs
+    await websocket.accept()
+    db = SessionLocal()
+    try:
+        message = await asyncio.wait_for(websocket.receive_json(), WS_AUTH_TIMEOUT_SECONDS)
+        token = message.get("token") if isinstance(message, dict) else None
+        user = user_from_token(str(token or ""), db)
+        job = get_owned_job(job_id, user)
+    # ValueError and KeyError come from a first frame that is not JSON text
+    except (HTTPException, asyncio.TimeoutError, ValueError, KeyError):
+        await websocket.close(code=4401)
+        return
+    except WebSocketDisconnect:
+        return
+    finally:
+        db.close()
+
+    events = asyncio.Queue()
+    job.subscribe(asyncio.get_running_loop(), events)
+    try:
+        # Subscribe before the snapshot so no event can fall between the two
+        snapshot = job.snapshot()
+        await websocket.send_json({"event": "snapshot", **snapshot})
+        finished = snapshot["status"] in ("completed", "failed")
+        while not finished:
+            event = await events.get()
+            await websocket.send_json(event)
+            finished = event["event"] in ("completed", "failed")
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        job.unsubscribe(events)
 
 @app.get("/api/user-stats")
 async def get_user_stats(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    attempts = db.query(ChallengeAttempt).filter(
-        ChallengeAttempt.user_id == current_user.id
-    ).all()
-    
-    total_attempts = len(attempts)
-    passed_attempts = len([a for a in attempts if a.passed])
-    failed_attempts = total_attempts - passed_attempts
-    
-    # Count by difficulty
-    difficulty_stats = {"Easy": 0, "Medium": 0, "Hard": 0}
-    for attempt in attempts:
-        if attempt.passed:
-            problem = db.query(CodingProblem).filter(
-                CodingProblem.id == attempt.problem_id
-            ).first()
-            if problem:
-                difficulty_stats[problem.difficulty] += 1
-    
-    return {
-        "total_attempts": total_attempts,
-        "passed": passed_attempts,
-        "failed": failed_attempts,
-        "difficulty_stats": difficulty_stats
-    }
+    return load_user_stats(db, current_user.id)
+
+def encode_history_cursor(history: History) -> str:
+    raw = f"{history.created_at.isoformat()}|{history.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_history_cursor(cursor: str):
+    try:
+        created_at, history_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(history_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @app.get("/api/history")
 async def get_history(
-    current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    histories = db.query(History).filter(
-        History.user_id == current_user.id
-    ).order_by(History.created_at.desc()).limit(50).all()
-    
-    return [{
+    limit = max(1, min(limit, 100))
+    query = db.query(History).filter(History.user_id == current_user.id)
+    if cursor:
+        # Keyset pagination: seek past the last row of the previous page
+        created_at, history_id = decode_history_cursor(cursor)
+        query = query.filter(or_(
+            History.created_at < created_at,
+            and_(History.created_at == created_at, History.id < history_id)
+        ))
+    # Only summary columns; full texts live in compressed payload rows
+    histories = query.with_entities(
+        History.id, History.request_type, History.input_preview, History.created_at
+    ).order_by(History.created_at.desc(), History.id.desc()).limit(limit + 1).all()
+    
+    headers = {}
+    if len(histories) > limit:
+        histories = histories[:limit]
+        headers["X-Next-Cursor"] = encode_history_cursor(histories[-1])
+    
+    return JSONResponse([{
         "id": h.id,
         "type": h.request_type,
-        "input": h.input_text[:200] + "..." if len(h.input_text) > 200 else h.input_text,
+        "input": h.input_preview,
         "created_at": h.created_at.isoformat()
-    } for h in histories]
+    } for h in histories], headers=headers)
 
 @app.get("/api/history/{history_id}")
 async def get_history_detail(
     history_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     history = db.query(History).filter(
@@ -382,59 +631,121 @@ async def get_history_detail(
     if not history:
         raise HTTPException(status_code=404, detail="History not found")
     
+    input_text, output_text = load_texts(history)
     return {
         "type": history.request_type,
-        "input": history.input_text,
-        "output": history.output_text,
+        "input": input_text,
+        "output": output_text,
         "created_at": history.created_at.isoformat()
     }
 
+# Metrics endpoint
+@app.get("/api/metrics")
+async def get_metrics(current_user: Principal = Depends(get_current_admin)):
+    return metrics_registry.snapshot()
+
 # PDF Download endpoint
+def export_params(export_format: str, entries: str, ids: Optional[str]):
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if entries not in ENTRY_FORMATS:
+        raise HTTPException(status_code=400, detail=f"entries must be one of {', '.join(ENTRY_FORMATS)}")
+    try:
+        return [int(i) for i in ids.split(",") if i.strip()] if ids else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of history ids")
+
+@app.get("/api/exports/history")
+async def export_history(
+    format: str = "zip",
+    entries: str = "md",
+    ids: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user)
+):
+    """Stream the user's history (all entries, or just ids) as a ZIP or JSONL file"""
+    selected = export_params(format, entries, ids)
+    chunks, release = export_manager.stream(current_user.id, format, entries, selected)
+    return StreamingResponse(
+        chunks,
+        media_type="application/zip" if format == "zip" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(format)}"'},
+        # Covers a client that leaves before the stream starts
+        background=BackgroundTask(release)
+    )
+
+@app.post("/api/exports")
+async def start_export(
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
+):
+    data = await request.json()
+    ids = data.get("ids")
+    selected = export_params(
+        data.get("format", "zip"), data.get("entries", "md"),
+        ",".join(str(i) for i in ids) if ids else None
+    )
+    job = export_manager.start(current_user.id, data.get("format", "zip"), data.get("entries", "md"), selected)
+    return job.snapshot()
+
+def get_owned_export(job_id: str, user: Principal):
+    job = export_manager.get(job_id)
+    if job is None or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return job
+
+@app.get("/api/exports/{job_id}")
+async def get_export(job_id: str, current_user: Principal = Depends(get_current_user)):
+    return get_owned_export(job_id, current_user).snapshot()
+
+@app.get("/api/exports/{job_id}/download")
+async def download_export(job_id: str, current_user: Principal = Depends(get_current_user)):
+    job = get_owned_export(job_id, current_user)
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}")
+    return FileResponse(job.path, filename=job.filename)
+
+def pdf_response(title: str, output) -> StreamingResponse:
+    size = output.seek(0, os.SEEK_END)
+    output.seek(0)
+    return StreamingResponse(
+        iter_file(output),
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f'attachment; filename="{pdf_filename(title)}"',
+            "Content-Length": str(size)
+        }
+    )
+
 @app.post("/api/download-pdf")
 async def download_pdf(
     request: Request,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     data = await request.json()
     content = data.get("content")
     title = data.get("title", "SDLC Output")
     
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor='darkblue',
-        spaceAfter=30
-    )
-    story.append(Paragraph(title, title_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Content
-    content_style = ParagraphStyle(
-        'Code',
-        parent=styles['Code'],
-        fontSize=10,
-        leftIndent=20,
-        rightIndent=20
-    )
-    
-    # Split content into lines and add to PDF
-    for line in content.split('\n'):
-        story.append(Preformatted(line, content_style))
+    output = await run_in_threadpool(render_pdf, title, content)
+    return pdf_response(title, output)
+
+@app.get("/api/history/{history_id}/pdf")
+async def download_history_pdf(
+    history_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    history = db.query(History).filter(
+        History.id == history_id,
+        History.user_id == current_user.id
+    ).first()
     
-    doc.build(story)
-    buffer.seek(0)
+    if not history:
+        raise HTTPException(status_code=404, detail="History not found")
     
-    return JSONResponse({
-        "pdf_data": base64.b64encode(buffer.getvalue()).decode(),
-        "filename": f"{title.replace(' ', '_')}.pdf"
-    })
+    input_text, output_text = load_texts(history)
+    title, content = format_history(history.request_type, input_text, output_text)
+    output = await run_in_threadpool(render_pdf, title, content)
+    return pdf_response(title, output)
 
 if __name__ == "__main__":
     import uvicorn
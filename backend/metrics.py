@@ -0,0 +1,69 @@
+import threading
+from bisect import bisect_left
+
+class Histogram:
+    """Fixed-bucket histogram, in milliseconds unless another unit is given"""
+
+    DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, unit: str = "ms"):
+        self.buckets = tuple(buckets)
+        self.unit = unit
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float):
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value_ms)] += 1
+            self._sum += value_ms
+            self._count += 1
+            self._max = max(self._max, value_ms)
+
+    def percentile(self, q: float) -> float:
+        """Approximate percentile using the upper bound of the matching bucket"""
+        with self._lock:
+            if self._count == 0:
+                return 0.0
+            target = q * self._count
+            running = 0
+            for i, count in enumerate(self._counts):
+                running += count
+                if running >= target:
+                    return float(self.buckets[i]) if i < len(self.buckets) else self._max
+            return self._max
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            count = self._count
+            total = self._sum
+            buckets = {f"le_{b}": c for b, c in zip(self.buckets, self._counts)}
+            buckets["le_inf"] = self._counts[-1]
+        return {
+            "count": count,
+            f"avg_{self.unit}": round(total / count, 2) if count else 0.0,
+            f"p50_{self.unit}": self.percentile(0.5),
+            f"p99_{self.unit}": self.percentile(0.99),
+            f"max_{self.unit}": round(self._max, 2),
+            "buckets": buckets
+        }
+
+class MetricsRegistry:
+    """Collects named stats providers so they can be served from one endpoint"""
+
+    def __init__(self):
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, source):
+        with self._lock:
+            self._sources[name] = source
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            sources = dict(self._sources)
+        return {name: source() for name, source in sources.items()}
+
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,49 @@
+from datetime import datetime
+from sqlalchemy import inspect, text
+
+from history_store import migrate_legacy_rows
+
+def add_column(table: str, column: str, ddl_type: str):
+    def migrate(connection):
+        if column not in {c["name"] for c in inspect(connection).get_columns(table)}:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+    return migrate
+
+# Ordered schema changes for databases created before the matching model
+# change. Fresh databases already get these from create_all, so every
+# step must be safe to run against a schema that has them. A step is a SQL
+# string or a callable taking the connection.
+MIGRATIONS = [
+    (1, "composite indexes for per-user history and attempts", [
+        "CREATE INDEX IF NOT EXISTS ix_histories_user_created ON histories (user_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_challenge_attempts_user_created ON challenge_attempts (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_challenge_attempts_problem ON challenge_attempts (problem_id)",
+    ]),
+    (2, "history summary columns and compressed payloads", [
+        add_column("histories", "input_preview", "VARCHAR"),
+        add_column("histories", "input_size", "INTEGER"),
+        add_column("histories", "output_size", "INTEGER"),
+        migrate_legacy_rows,
+    ]),
+]
+
+def run_migrations(engine):
+    """Apply every migration newer than the database's recorded version"""
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, description VARCHAR, applied_at TIMESTAMP)"
+        ))
+        applied = {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+        for version, description, steps in MIGRATIONS:
+            if version in applied:
+                continue
+            for step in steps:
+                if callable(step):
+                    step(connection)
+                else:
+                    connection.execute(text(step))
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": version, "d": description, "t": datetime.utcnow()}
+            )
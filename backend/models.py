@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, UniqueConstraint, Index, LargeBinary
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from database import Base
 
@@ -17,15 +17,31 @@ class User(Base):
 
 class History(Base):
     __tablename__ = "histories"
+    __table_args__ = (
+        Index("ix_histories_user_created", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     request_type = Column(String)  # code, test_cases, bug_fix, requirements_to_code
-    input_text = Column(Text)
-    output_text = Column(Text)
+    input_preview = Column(String)  # first 200 characters of the input
+    input_size = Column(Integer)
+    output_size = Column(Integer)
+    # Legacy full-text columns; new rows keep their text in HistoryPayload
+    input_text = deferred(Column(Text))
+    output_text = deferred(Column(Text))
     created_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User", back_populates="histories")
+    payload = relationship("HistoryPayload", uselist=False, cascade="all, delete-orphan")
+
+class HistoryPayload(Base):
+    __tablename__ = "history_payloads"
+    
+    history_id = Column(Integer, ForeignKey("histories.id"), primary_key=True)
+    codec = Column(String)  # compression used for both blobs
+    input_blob = Column(LargeBinary)
+    output_blob = Column(LargeBinary)
 
 class CodingProblem(Base):
     __tablename__ = "coding_problems"
@@ -42,6 +58,10 @@ class CodingProblem(Base):
 
 class ChallengeAttempt(Base):
     __tablename__ = "challenge_attempts"
+    __table_args__ = (
+        Index("ix_challenge_attempts_user_created", "user_id", "created_at"),
+        Index("ix_challenge_attempts_problem", "problem_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -52,4 +72,41 @@ class ChallengeAttempt(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User", back_populates="challenges")
-    problem = relationship("CodingProblem", back_populates="attempts")
\ No newline at end of file
+    problem = relationship("CodingProblem", back_populates="attempts")
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_attempts = Column(Integer, default=0)
+    passed = Column(Integer, default=0)
+    passed_easy = Column(Integer, default=0)
+    passed_medium = Column(Integer, default=0)
+    passed_hard = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class SubmissionVerdict(Base):
+    __tablename__ = "submission_verdicts"
+    __table_args__ = (
+        UniqueConstraint("problem_id", "test_set_version", "language", "source_hash", name="uq_submission_verdict"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    problem_id = Column(Integer, ForeignKey("coding_problems.id"), index=True)
+    test_set_version = Column(String)  # sha256 of CodingProblem.test_cases
+    language = Column(String)
+    source_hash = Column(String)  # sha256 of the normalized source
+    results = Column(Text)  # JSON string
+    all_passed = Column(Boolean)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_response_cache"
+    
+    key = Column(String, primary_key=True)  # sha256 of model, template, inputs and params
+    task = Column(String, index=True)
+    response = Column(Text)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,68 @@
+import re
+import tempfile
+from functools import lru_cache
+from xml.sax.saxutils import escape
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Preformatted
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+
+# Lines per Preformatted flowable; long blocks still split across pages
+LINES_PER_BLOCK = 60
+CHUNK_SIZE = 64 * 1024
+# Rendered PDFs stay in memory up to this size, then spill to a temp file
+SPOOL_MAX_BYTES = 4 * 1024 * 1024
+
+@lru_cache(maxsize=1)
+def styles() -> dict:
+    """Paragraph styles, built once per process"""
+    base = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle(
+            'CustomTitle',
+            parent=base['Heading1'],
+            fontSize=24,
+            textColor='darkblue',
+            spaceAfter=30
+        ),
+        "content": ParagraphStyle(
+            'Code',
+            parent=base['Code'],
+            fontSize=10,
+            leftIndent=20,
+            rightIndent=20
+        )
+    }
+
+def pdf_filename(title: str) -> str:
+    return re.sub(r'[^\w.-]+', '_', title).strip('_') + ".pdf"
+
+def build_story(title: str, content: str) -> list:
+    style = styles()
+    story = [Paragraph(escape(title), style["title"]), Spacer(1, 0.2*inch)]
+    lines = (content or "").split('\n')
+    for start in range(0, len(lines), LINES_PER_BLOCK):
+        story.append(Preformatted('\n'.join(lines[start:start + LINES_PER_BLOCK]), style["content"]))
+    return story
+
+def render_pdf(title: str, content: str):
+    """Render to a spooled file rewound to the start; the caller closes it"""
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    try:
+        SimpleDocTemplate(output, pagesize=letter, title=title).build(build_story(title, content))
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
+
+def iter_file(output):
+    """Yield a rendered PDF in chunks, closing it when done"""
+    try:
+        while True:
+            chunk = output.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        output.close()
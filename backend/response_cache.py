@@ -0,0 +1,178 @@
+import os
+import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+from database import SessionLocal
+from models import LLMCacheEntry
+from metrics import metrics_registry
+
+load_dotenv()
+
+def normalize_input(text) -> str:
+    """Normalize line endings and trailing whitespace without touching indentation"""
+    if text is None:
+        return ""
+    lines = str(text).replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+class ResponseCache:
+    """Two-tier cache of LLM responses: an in-process LRU in front of a SQLite table.
+
+    Keys are content hashes of (model_id, prompt template, normalized inputs,
+    generation params), so any change to the template or params misses.
+    """
+
+    def __init__(self, max_entries: int, max_persistent_entries: int, ttl_seconds: int, enabled: bool = True):
+        self.max_entries = max_entries
+        self.max_persistent_entries = max_persistent_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self._hits_memory = 0
+        self._hits_persistent = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(model_id: str, task: str, template: str, inputs: dict, params: dict) -> str:
+        payload = json.dumps({
+            "model_id": model_id,
+            "task": task,
+            "template": hashlib.sha256(template.encode()).hexdigest(),
+            "inputs": {name: normalize_input(value) for name, value in inputs.items()},
+            "params": params
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._hits_memory += 1
+                    return value
+                del self._memory[key]
+
+        value = self._get_persistent(key)
+        with self._lock:
+            if value is None:
+                self._misses += 1
+                return None
+            self._hits_persistent += 1
+        self._remember(key, value)
+        return value
+
+    def set(self, key: str, task: str, value: str):
+        if not self.enabled or value is None:
+            return
+        self._remember(key, value)
+        self._set_persistent(key, task, value)
+
+    def _remember(self, key: str, value: str):
+        with self._lock:
+            self._memory[key] = (value, time.time() + self.ttl_seconds)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._evictions += 1
+
+    def _get_persistent(self, key: str):
+        db = SessionLocal()
+        try:
+            entry = db.query(LLMCacheEntry).filter(LLMCacheEntry.key == key).first()
+            if entry is None:
+                return None
+            if entry.created_at < datetime.utcnow() - timedelta(seconds=self.ttl_seconds):
+                db.delete(entry)
+                db.commit()
+                return None
+            entry.hit_count = (entry.hit_count or 0) + 1
+            entry.last_used_at = datetime.utcnow()
+            db.commit()
+            return entry.response
+        finally:
+            db.close()
+
+    def _set_persistent(self, key: str, task: str, value: str):
+        db = SessionLocal()
+        try:
+            db.merge(LLMCacheEntry(
+                key=key,
+                task=task,
+                response=value,
+                created_at=datetime.utcnow(),
+                last_used_at=datetime.utcnow(),
+                hit_count=0
+            ))
+            db.commit()
+            with self._lock:
+                self._writes_since_prune += 1
+                should_prune = self._writes_since_prune >= 100
+                if should_prune:
+                    self._writes_since_prune = 0
+            if should_prune:
+                self._prune(db)
+        finally:
+            db.close()
+
+    def _prune(self, db):
+        """Drop expired rows, then the least recently used rows beyond the size limit"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        removed = db.query(LLMCacheEntry).filter(LLMCacheEntry.created_at < cutoff).delete()
+        overflow = db.query(LLMCacheEntry).count() - self.max_persistent_entries
+        if overflow > 0:
+            stale_keys = [
+                row.key for row in db.query(LLMCacheEntry.key)
+                .order_by(LLMCacheEntry.last_used_at.asc())
+                .limit(overflow)
+            ]
+            removed += db.query(LLMCacheEntry).filter(
+                LLMCacheEntry.key.in_(stale_keys)
+            ).delete(synchronize_session=False)
+        db.commit()
+        with self._lock:
+            self._evictions += removed
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        db = SessionLocal()
+        try:
+            db.query(LLMCacheEntry).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._hits_memory + self._hits_persistent
+            lookups = hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "memory_entries": len(self._memory),
+                "hits_memory": self._hits_memory,
+                "hits_persistent": self._hits_persistent,
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions
+            }
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),
+    max_persistent_entries=int(os.getenv("LLM_CACHE_MAX_PERSISTENT_ENTRIES", "10000")),
+    ttl_seconds=int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    enabled=os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+)
+metrics_registry.register("llm_response_cache", response_cache.stats)
@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import queue
+import signal
+import selectors
+import subprocess
+import threading
+import time
+from dotenv import load_dotenv
+
+from metrics import Histogram, metrics_registry
+
+load_dotenv()
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+
+class SandboxWorker:
+    """One warm fork-server process; handles one job at a time"""
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0
+        )
+        self._buffer = b""
+        # Process group of the submission currently running, if any
+        self.active_pid = None
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def send(self, job: dict):
+        self.process.stdin.write((json.dumps(job) + "\n").encode())
+
+    def cancel(self):
+        self.process.stdin.write(b"cancel\n")
+
+    def receive(self, timeout: float) -> dict:
+        """Read one JSON result line, or raise TimeoutError if the worker stops answering"""
+        deadline = time.monotonic() + timeout
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.process.stdout, selectors.EVENT_READ)
+            while True:
+                while b"\n" not in self._buffer:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not selector.select(remaining):
+                        raise TimeoutError("Sandbox worker did not respond")
+                    chunk = os.read(self.process.stdout.fileno(), 65536)
+                    if not chunk:
+                        raise EOFError("Sandbox worker exited")
+                    self._buffer += chunk
+                line, self._buffer = self._buffer.split(b"\n", 1)
+                message = json.loads(line)
+                if "started" in message:
+                    self.active_pid = message["started"]
+                    continue
+                self.active_pid = None
+                return message
+
+    def request(self, job: dict, timeout: float) -> dict:
+        self.send(job)
+        return self.receive(timeout)
+
+    def kill(self):
+        """Kill the worker and any submission it was running, so no job outlives its worker"""
+        if self.active_pid is not None:
+            try:
+                os.killpg(self.active_pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+            self.active_pid = None
+        try:
+            self.process.kill()
+            self.process.wait(timeout=1)
+        except Exception:
+            pass
+
+class SandboxPool:
+    """Pool of warm fork-server workers for running Python submissions.
+
+    Each job forks from an already-initialized interpreter instead of
+    starting a new one, so per-run overhead is a fork rather than a full
+    interpreter startup.
+    """
+
+    def __init__(self, size: int, memory_mb: int):
+        self.size = size
+        self.memory_mb = memory_mb
+        # Fork servers rely on os.fork and the resource module
+        self.enabled = size > 0 and os.name == "posix"
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(size, 1))
+        self._lock = threading.Lock()
+        self._jobs = 0
+        self._spawned = 0
+        self._restarts = 0
+        self._batch_cases = 0
+        self.latency = Histogram()
+
+    def _checkout(self) -> SandboxWorker:
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    self._spawned += 1
+                return SandboxWorker()
+            if worker.alive():
+                return worker
+            with self._lock:
+                self._restarts += 1
+
+    def submit(self, job: dict, timeout: float) -> dict:
+        """Run one job on a warm worker, replacing the worker if it misbehaves"""
+        job = {"memory_mb": self.memory_mb, **job, "timeout": timeout}
+        started = time.perf_counter()
+        self._slots.acquire()
+        try:
+            worker = self._checkout()
+            try:
+                # The worker enforces the job timeout itself; this margin only guards against a hung worker
+                result = worker.request(job, timeout + 5)
+            except Exception:
+                worker.kill()
+                with self._lock:
+                    self._restarts += 1
+                raise
+            self._idle.put(worker)
+        finally:
+            self._slots.release()
+        self.latency.observe((time.perf_counter() - started) * 1000)
+        with self._lock:
+            self._jobs += 1
+        return result
+
+    def run_batch(self, code: str, inputs: list, timeout: float, keep_going=None) -> list:
+        """Run every input against one compiled copy of code on a single worker.
+
+        Results stream back one case at a time; if keep_going returns False
+        for a result the worker is told to stop before the next case.
+        """
+        job = {"memory_mb": self.memory_mb, "code": code, "inputs": inputs, "timeout": timeout}
+        started = time.perf_counter()
+        results = []
+        self._slots.acquire()
+        try:
+            worker = self._checkout()
+            try:
+                worker.send(job)
+                cancelled = False
+                while True:
+                    message = worker.receive(timeout + 5)
+                    if message.get("done"):
+                        if "case" not in message and message.get("error"):
+                            raise RuntimeError(message["error"])
+                        break
+                    message.pop("case", None)
+                    results.append(message)
+                    if not cancelled and keep_going is not None and not keep_going(message):
+                        worker.cancel()
+                        cancelled = True
+            except Exception:
+                worker.kill()
+                with self._lock:
+                    self._restarts += 1
+                raise
+            self._idle.put(worker)
+        finally:
+            self._slots.release()
+        self.latency.observe((time.perf_counter() - started) * 1000)
+        with self._lock:
+            self._jobs += 1
+            self._batch_cases += len(results)
+        return results
+
+    def warm(self):
+        """Start every worker up front so the first submissions don't pay for interpreter startup"""
+        if not self.enabled:
+            return
+        for _ in range(self.size - self._idle.qsize()):
+            with self._lock:
+                self._spawned += 1
+            self._idle.put(SandboxWorker())
+
+    def execute(self, code: str, test_input: str, timeout: float) -> dict:
+        return self.submit({"code": code, "input": test_input}, timeout)
+
+    def shutdown(self):
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "jobs": self._jobs,
+                "spawned": self._spawned,
+                "restarts": self._restarts,
+                "batch_cases": self._batch_cases,
+                "latency": self.latency.snapshot()
+            }
+
+sandbox_pool = SandboxPool(
+    size=int(os.getenv("SANDBOX_POOL_SIZE", str(os.cpu_count() or 2))),
+    memory_mb=int(os.getenv("SANDBOX_MEMORY_LIMIT_MB", "512"))
+)
+metrics_registry.register("sandbox_pool", sandbox_pool.stats)
@@ -0,0 +1,253 @@
+"""Fork-server sandbox for running Python submissions.
+
+Started once by sandbox_pool.SandboxPool and kept warm. Each job arrives on
+stdin as one JSON line; the server forks a fresh child that applies resource
+limits, runs the code with the job's input on fd 0 and its own pipes on
+fds 1/2, and exits. Because every job runs in a throwaway child, nothing a
+submission does survives into the next job. The result is written back as
+one JSON line on stdout, preceded by a {"started": pid} line naming the
+child's process group so the pool can kill it if this server stops answering.
+
+A batch job ({"code", "inputs": [...]}) compiles the submission once and
+forks one child per input from the compiled code. Each case's result is
+written as its own line tagged with "case", followed by {"done": true}. A
+"cancel" line sent between cases stops the batch early.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import resource
+import selectors
+import traceback
+
+MAX_OUTPUT_BYTES = 1024 * 1024
+
+def apply_limits(job: dict):
+    cpu_seconds = int(job["timeout"]) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    memory = int(job.get("memory_mb", 512)) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    file_size = int(job.get("file_size_mb", 16)) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_FSIZE, (file_size, file_size))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+def run_child(code, stdin_fd: int, stdout_fd: int, stderr_fd: int, job: dict):
+    """Body of the forked child; never returns"""
+    status = 1
+    try:
+        os.setsid()
+        os.dup2(stdin_fd, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        os.closerange(3, 256)
+        apply_limits(job)
+
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", closefd=False)
+        sys.stderr = open(2, "w", closefd=False)
+        sys.argv = ["<submission>"]
+        try:
+            if isinstance(code, str):
+                code = compile(code, "<submission>", "exec")
+            exec(code, {"__name__": "__main__", "__builtins__": __builtins__})
+            status = 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                status = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                status = 1
+        except BaseException:
+            etype, value, tb = sys.exc_info()
+            # Drop this function's frame so the traceback starts at the submission
+            traceback.print_exception(etype, value, tb.tb_next)
+            status = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(status)
+
+def run_job(job: dict, code=None) -> dict:
+    """Fork a child for one input and collect its output, exit status and CPU time"""
+    timeout = float(job["timeout"])
+    stdin_data = job.get("input", "").encode()
+    in_r, in_w = os.pipe()
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+
+    started = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        run_child(code if code is not None else job["code"], in_r, out_w, err_w, job)
+
+    os.close(in_r)
+    os.close(out_w)
+    os.close(err_w)
+    write({"started": pid})
+
+    selector = selectors.DefaultSelector()
+    os.set_blocking(in_w, False)
+    if stdin_data:
+        selector.register(in_w, selectors.EVENT_WRITE)
+    else:
+        os.close(in_w)
+    selector.register(out_r, selectors.EVENT_READ)
+    selector.register(err_r, selectors.EVENT_READ)
+
+    output = {out_r: bytearray(), err_r: bytearray()}
+    pending_input = memoryview(stdin_data)
+    deadline = started + timeout
+    timed_out = False
+    truncated = False
+    open_readers = 2
+
+    while open_readers:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        for key, _ in selector.select(remaining):
+            fd = key.fd
+            if fd == in_w:
+                try:
+                    written = os.write(in_w, pending_input[:65536])
+                except BrokenPipeError:
+                    written = len(pending_input)
+                pending_input = pending_input[written:]
+                if not pending_input:
+                    selector.unregister(in_w)
+                    os.close(in_w)
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                selector.unregister(fd)
+                open_readers -= 1
+                continue
+            output[fd] += chunk
+            if len(output[fd]) > MAX_OUTPUT_BYTES:
+                truncated = True
+                break
+        if truncated:
+            break
+
+    if not timed_out and not truncated:
+        # A child can close its stdio and keep running; the wall limit still
+        # applies. WNOWAIT leaves it unreaped so its pid can't be reused yet.
+        while not os.waitid(os.P_PID, pid, os.WEXITED | os.WNOHANG | os.WNOWAIT):
+            if time.monotonic() >= deadline:
+                timed_out = True
+                break
+            time.sleep(0.005)
+
+    # Also takes down anything the child left running in its process group
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    _, status, usage = os.wait4(pid, 0)
+    wall_ms = (time.monotonic() - started) * 1000
+    for fd in list(selector.get_map()):
+        selector.unregister(fd)
+        os.close(fd)
+    for fd in (out_r, err_r):
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+    selector.close()
+
+    stdout = output[out_r].decode(errors="replace")
+    stderr = output[err_r].decode(errors="replace")
+    if os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGXCPU:
+        timed_out = True
+    if truncated:
+        stderr += "\nOutput limit exceeded"
+
+    return {
+        "success": not timed_out and not truncated and os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0,
+        "output": stdout,
+        "error": stderr,
+        "timed_out": timed_out,
+        "wall_ms": round(wall_ms, 3),
+        "cpu_ms": round((usage.ru_utime + usage.ru_stime) * 1000, 3)
+    }
+
+class LineReader:
+    """Unbuffered line reader over fd 0 that can also poll for a pending line"""
+
+    def __init__(self):
+        self._buffer = b""
+
+    def _fill(self, timeout=None) -> bool:
+        if timeout is not None:
+            with selectors.DefaultSelector() as selector:
+                selector.register(0, selectors.EVENT_READ)
+                if not selector.select(timeout):
+                    return True
+        chunk = os.read(0, 65536)
+        if not chunk:
+            return False
+        self._buffer += chunk
+        return True
+
+    def readline(self):
+        while b"\n" not in self._buffer:
+            if not self._fill():
+                return None
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line
+
+    def poll_line(self):
+        """Return a complete line if one is already waiting, without blocking"""
+        if b"\n" not in self._buffer:
+            self._fill(timeout=0)
+        if b"\n" not in self._buffer:
+            return None
+        return self.readline()
+
+def write(message: dict):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+def run_batch(job: dict, reader: LineReader):
+    try:
+        code = compile(job["code"], "<submission>", "exec")
+    except SyntaxError:
+        code = None
+        error = traceback.format_exc(limit=0)
+
+    for index, test_input in enumerate(job["inputs"]):
+        if reader.poll_line() == b"cancel":
+            break
+        if code is None:
+            result = {"success": False, "output": "", "error": error, "timed_out": False}
+        else:
+            result = run_job({**job, "input": test_input}, code=code)
+        write({"case": index, **result})
+    write({"done": True})
+
+def main():
+    reader = LineReader()
+    while True:
+        line = reader.readline()
+        if line is None:
+            break
+        if not line.strip() or line == b"cancel":
+            continue
+        job = None
+        try:
+            job = json.loads(line)
+            if "inputs" in job:
+                run_batch(job, reader)
+                continue
+            result = run_job(job)
+        except Exception as e:
+            result = {"success": False, "output": "", "error": f"Sandbox error: {e}", "timed_out": False}
+            if isinstance(job, dict) and "inputs" in job:
+                result["done"] = True
+        write(result)
+
+if __name__ == "__main__":
+    main()
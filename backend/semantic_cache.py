@@ -0,0 +1,154 @@
+import os
+import math
+import time
+import threading
+from collections import Counter
+import numpy as np
+from dotenv import load_dotenv
+
+from text_features import HashingVectorizer, normalize, tokenize
+from metrics import Histogram, metrics_registry
+
+load_dotenv()
+
+# Hashed matches rescored on their terms per lookup; more only helps if many entries collide
+MAX_CANDIDATES = 5
+
+class SemanticCache:
+    """Answers for near-duplicate questions, matched by TF-IDF cosine similarity.
+
+    Questions are stored as hashed term-frequency rows of one preallocated
+    matrix, alongside their element-wise squares. IDF weights come from the
+    document frequencies of everything cached so far; a lookup folds them
+    into the query, so scoring is two matrix-vector products with no copy
+    of the matrix. Unrelated terms can share a hash
+    bucket, so candidates above the threshold are rescored on their actual
+    terms before one is accepted. When full, the least recently used entry
+    is overwritten.
+    """
+
+    def __init__(self, vectorizer: HashingVectorizer, threshold: float, max_entries: int,
+                 ttl_seconds: float, enabled: bool = True):
+        self.vectorizer = vectorizer
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._reset()
+        self._hits = 0
+        self._misses = 0
+        self.lookup_time = Histogram((0.1, 0.5, 1, 2, 5, 10, 25, 50, 100))
+
+    def _reset(self):
+        self._matrix = np.zeros((self.max_entries, self.vectorizer.n_features), dtype=np.float32)
+        self._squares = np.zeros((self.max_entries, self.vectorizer.n_features), dtype=np.float32)
+        self._doc_freq = np.zeros(self.vectorizer.n_features, dtype=np.float32)
+        self._stored_at = np.zeros(self.max_entries)
+        self._last_used = np.zeros(self.max_entries)
+        self._questions = [None] * self.max_entries
+        self._terms = [None] * self.max_entries
+        self._answers = [None] * self.max_entries
+        self._count = 0
+
+    def _idf(self) -> np.ndarray:
+        return np.log((1 + self._count) / (1 + self._doc_freq)) + 1
+
+    def lookup(self, text: str):
+        """Return (answer, similarity) for the closest cached question above the threshold"""
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        terms = Counter(tokenize(text))
+        query = self.vectorizer.transform(text)
+        with self._lock:
+            match = self._nearest(query, terms) if query.any() and self._count else None
+            if match is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        self.lookup_time.observe((time.perf_counter() - started) * 1000)
+        return match
+
+    def _nearest(self, query: np.ndarray, terms: Counter):
+        idf = self._idf()
+        idf_squared = idf * idf
+        # cos(row * idf, query * idf) without materializing the weighted rows
+        dots = self._matrix[:self._count] @ (query * idf_squared)
+        norms = np.sqrt(self._squares[:self._count] @ idf_squared) * np.linalg.norm(query * idf)
+        scores = dots / np.maximum(norms, 1e-12)
+        # Expired entries can never match
+        scores[self._stored_at[:self._count] < time.time() - self.ttl] = -1
+        for best in np.argsort(-scores)[:MAX_CANDIDATES]:
+            if scores[best] < self.threshold:
+                break
+            score = self._term_similarity(terms, self._terms[best], idf)
+            if score >= self.threshold:
+                self._last_used[best] = time.time()
+                return self._answers[best], round(score, 4)
+        return None
+
+    def _term_similarity(self, query: Counter, cached: Counter, idf: np.ndarray) -> float:
+        """TF-IDF cosine over the terms themselves, so a hash collision cannot make two questions match"""
+        def weights(terms):
+            return {term: (1 + math.log(count)) * idf[self.vectorizer.index(term)] for term, count in terms.items()}
+
+        query, cached = weights(query), weights(cached)
+        dot = sum(weight * cached[term] for term, weight in query.items() if term in cached)
+        if not dot:
+            return 0.0
+        norm = math.sqrt(sum(w * w for w in query.values())) * math.sqrt(sum(w * w for w in cached.values()))
+        return float(dot / norm)
+
+    def store(self, text: str, answer: str):
+        if not self.enabled or not answer:
+            return
+        vector = self.vectorizer.transform(text)
+        if not vector.any():
+            return
+        now = time.time()
+        with self._lock:
+            if self._count < self.max_entries:
+                slot = self._count
+                self._count += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._doc_freq -= self._matrix[slot] > 0
+            self._matrix[slot] = vector
+            self._squares[slot] = vector * vector
+            self._doc_freq += vector > 0
+            self._stored_at[slot] = now
+            self._last_used[slot] = now
+            self._questions[slot] = normalize(text)
+            self._terms[slot] = Counter(tokenize(text))
+            self._answers[slot] = answer
+
+    def purge(self) -> int:
+        with self._lock:
+            purged = self._count
+            self._reset()
+            return purged
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            stats = {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "entries": self._count,
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0
+            }
+        stats["lookup_time"] = self.lookup_time.snapshot()
+        return stats
+
+voice_cache = SemanticCache(
+    HashingVectorizer(int(os.getenv("VOICE_CACHE_FEATURES", "2048"))),
+    threshold=float(os.getenv("VOICE_CACHE_THRESHOLD", "0.85")),
+    max_entries=int(os.getenv("VOICE_CACHE_MAX_ENTRIES", "2000")),
+    ttl_seconds=float(os.getenv("VOICE_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    enabled=os.getenv("VOICE_CACHE_ENABLED", "true").lower() == "true"
+)
+metrics_registry.register("voice_cache", voice_cache.stats)
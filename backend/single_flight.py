@@ -0,0 +1,119 @@
+import asyncio
+import threading
+
+_DONE = object()
+
+class _SharedStream:
+    def __init__(self):
+        self.chunks = []
+        self.subscribers = set()
+        self.task = None
+
+class SingleFlight:
+    """Merges concurrent identical requests onto one upstream call.
+
+    Callers pass a key that identifies the request and a factory for the
+    upstream call. While a call for a key is in flight, later callers with
+    the same key wait on it instead of starting their own, and all of them
+    receive its result or exception. Streams are shared the same way: a
+    caller joining late first receives the chunks already produced.
+    """
+
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._upstream = 0
+        self._coalesced = 0
+
+    def _count(self, coalesced: bool):
+        with self._lock:
+            if coalesced:
+                self._coalesced += 1
+            else:
+                self._upstream += 1
+
+    async def run(self, key, factory):
+        """Await factory() once per in-flight key and share its result"""
+        if not self.enabled:
+            return await factory()
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self._count(coalesced=False)
+        else:
+            self._count(coalesced=True)
+        # A caller that goes away must not cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every waiter went away
+            task.exception()
+
+    async def stream(self, key, factory):
+        """Iterate factory() once per in-flight key, fanning its chunks out to every caller"""
+        if not self.enabled:
+            async for chunk in factory():
+                yield chunk
+            return
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = _SharedStream()
+            self._streams[key] = shared
+            shared.task = asyncio.ensure_future(self._pump(key, shared, factory))
+            self._count(coalesced=False)
+        else:
+            self._count(coalesced=True)
+
+        queue = asyncio.Queue()
+        for chunk in shared.chunks:
+            queue.put_nowait(chunk)
+        shared.subscribers.add(queue)
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            shared.subscribers.discard(queue)
+            # Stop the upstream stream once nobody is listening
+            if not shared.subscribers and not shared.task.done():
+                shared.task.cancel()
+
+    async def _pump(self, key, shared: _SharedStream, factory):
+        end = _DONE
+        try:
+            async for chunk in factory():
+                shared.chunks.append(chunk)
+                for queue in shared.subscribers:
+                    queue.put_nowait(chunk)
+        except Exception as e:
+            end = e
+        finally:
+            # Callers arriving from now on start a fresh upstream call
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+        for queue in shared.subscribers:
+            queue.put_nowait(end)
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self._upstream + self._coalesced
+            return {
+                "enabled": self.enabled,
+                "in_flight": len(self._calls) + len(self._streams),
+                "requests": requests,
+                "upstream_calls": self._upstream,
+                "coalesced": self._coalesced,
+                "coalesce_rate": round(self._coalesced / requests, 4) if requests else 0.0
+            }
@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Never touch the checked-in database: database.py reads this at import
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="sdlc-tests-"), "test.db")
+
+@pytest.fixture
+def session():
+    """A session on a migrated test database, emptied again afterwards"""
+    from database import Base, SessionLocal, engine, init_db
+    from migrations import run_migrations
+
+    init_db()
+    run_migrations(engine)
+    db = SessionLocal()
+    yield db
+    db.close()
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient for the app; started once, as shutdown stops its worker pools for good"""
+    # main builds the LLM provider clients at import
+    pytest.importorskip("google.generativeai")
+    pytest.importorskip("ibm_watson_machine_learning")
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
@@ -0,0 +1,39 @@
+import pytest
+
+from admission import AdmissionController, AdmissionDenied, Limits, MemoryAdmissionStore, SQLiteAdmissionStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteAdmissionStore(str(tmp_path / "admission.db"))
+    return MemoryAdmissionStore()
+
+def controller(store, charge_upstream):
+    # A refill of one token a minute keeps the counts exact during the test
+    limits = Limits(rate_per_minute=1, burst=3, user_concurrency=2, concurrency=4, charge_upstream=charge_upstream)
+    return AdmissionController(store, {"llm": limits}, lease_seconds=60, busy_retry_seconds=1)
+
+def test_upfront_cost_is_charged_on_admission(store):
+    admission = controller(store, charge_upstream=False)
+    for _ in range(3):
+        admission.admit("llm", "user").release()
+    with pytest.raises(AdmissionDenied) as denied:
+        admission.admit("llm", "user")
+    assert denied.value.reason == "rate"
+
+def test_requests_without_upstream_calls_are_free(store):
+    admission = controller(store, charge_upstream=True)
+    for _ in range(10):
+        admission.admit("llm", "user", cost=3).release()
+    assert admission.stats()["charged_tokens"]["llm"] == 0
+
+def test_upstream_calls_are_charged_to_the_lease(store):
+    admission = controller(store, charge_upstream=True)
+    lease = admission.admit("llm", "user", cost=3)
+    for _ in range(3):
+        lease.charge()
+    lease.release()
+    with pytest.raises(AdmissionDenied):
+        admission.admit("llm", "user")
+    # Other users have their own bucket
+    admission.admit("llm", "other").release()
@@ -0,0 +1,45 @@
+import threading
+
+from sqlalchemy import text
+
+from database import SQLITE_PRAGMAS, db_metrics, engine
+
+def test_sqlite_connections_get_the_tuned_pragmas():
+    with engine.connect() as connection:
+        journal_mode = connection.execute(text("PRAGMA journal_mode")).scalar()
+        assert journal_mode.lower() == SQLITE_PRAGMAS["journal_mode"].lower()
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == SQLITE_PRAGMAS["busy_timeout"]
+        assert connection.execute(text("PRAGMA cache_size")).scalar() == SQLITE_PRAGMAS["cache_size"]
+
+def test_pool_and_statement_metrics_are_recorded():
+    before = db_metrics.stats()
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    after = db_metrics.stats()
+    assert after["pool"] == "TimedQueuePool"
+    assert after["checkouts"] == before["checkouts"] + 1
+    assert after["pool_wait"]["count"] == before["pool_wait"]["count"] + 1
+    assert after["read_time"]["count"] > before["read_time"]["count"]
+
+def test_concurrent_writers_queue_instead_of_failing():
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE IF NOT EXISTS write_test (value INTEGER)"))
+    errors = []
+
+    def write(value):
+        try:
+            for _ in range(20):
+                with engine.begin() as connection:
+                    connection.execute(text("INSERT INTO write_test (value) VALUES (:v)"), {"v": value})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with engine.begin() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM write_test")).scalar() == 160
+        connection.execute(text("DROP TABLE write_test"))
+    assert errors == []
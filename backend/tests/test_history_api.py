@@ -0,0 +1,56 @@
+import uuid
+from datetime import datetime, timedelta
+
+from history_store import build_history
+from models import User
+
+def login(client, session) -> tuple:
+    """Register a fresh user; returns (auth headers, user id)"""
+    username = f"user-{uuid.uuid4().hex[:8]}"
+    client.post("/register", data={"username": username, "email": f"{username}@example.com", "password": "secret"})
+    token = client.post("/token", data={"username": username, "password": "secret"}).json()["access_token"]
+    user_id = session.query(User.id).filter(User.username == username).scalar()
+    return {"Authorization": f"Bearer {token}"}, user_id
+
+def add_history(session, user_id: int, count: int) -> list:
+    """Add entries, two per timestamp so pages must break ties on id"""
+    started = datetime(2026, 1, 1)
+    rows = []
+    for i in range(count):
+        history = build_history(user_id, "code_generation", f"prompt {i}", f"output {i}")
+        history.created_at = started + timedelta(minutes=i // 2)
+        rows.append(history)
+    session.add_all(rows)
+    session.commit()
+    return [row.id for row in rows]
+
+def test_pages_cover_every_entry_once_newest_first(client, session):
+    headers, user_id = login(client, session)
+    other_headers, other_id = login(client, session)
+    ids = add_history(session, user_id, 7)
+    add_history(session, other_id, 3)
+
+    seen, cursor = [], None
+    while True:
+        response = client.get("/api/history", params={"limit": 3, **({"cursor": cursor} if cursor else {})},
+                              headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 3
+        seen += [entry["id"] for entry in page]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    expected = sorted(ids, key=lambda i: (ids.index(i) // 2, i), reverse=True)
+    assert seen == expected
+
+def test_last_page_has_no_cursor(client, session):
+    headers, user_id = login(client, session)
+    add_history(session, user_id, 2)
+    response = client.get("/api/history", params={"limit": 2}, headers=headers)
+    assert len(response.json()) == 2
+    assert "X-Next-Cursor" not in response.headers
+
+def test_invalid_cursor_is_rejected(client, session):
+    headers, _ = login(client, session)
+    assert client.get("/api/history", params={"cursor": "not-a-cursor"}, headers=headers).status_code == 400
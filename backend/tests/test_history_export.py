@@ -0,0 +1,39 @@
+import pytest
+
+import history_export
+from admission import AdmissionDenied
+from history_export import ExportManager
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_export, "iter_export", lambda *args: iter([b"chunk"]))
+    manager = ExportManager(str(tmp_path), max_running=1, max_per_user=1, max_pending=2, ttl_seconds=60)
+    yield manager
+    manager.shutdown()
+
+def test_stream_counts_against_the_user_limit(manager):
+    chunks, release = manager.stream(1, "jsonl", "md")
+    with pytest.raises(AdmissionDenied) as denied:
+        manager.stream(1, "jsonl", "md")
+    assert denied.value.reason == "user_concurrency"
+    with pytest.raises(AdmissionDenied):
+        manager.start(1, "jsonl", "md")
+    assert list(chunks) == [b"chunk"]
+    # Finishing the stream frees the slot
+    manager.stream(1, "jsonl", "md")[1]()
+
+def test_global_limit_applies_across_users(manager):
+    manager.stream(1, "jsonl", "md")
+    manager.stream(2, "jsonl", "md")
+    with pytest.raises(AdmissionDenied) as denied:
+        manager.stream(3, "jsonl", "md")
+    assert denied.value.reason == "concurrency"
+
+def test_release_is_idempotent(manager):
+    _, release = manager.stream(1, "jsonl", "md")
+    _, other = manager.stream(2, "jsonl", "md")
+    release()
+    release()
+    assert manager.stats()["streaming"] == 1
+    other()
+    assert manager.stats()["streaming"] == 0
@@ -0,0 +1,47 @@
+import history_store
+from database import engine
+from history_store import PREVIEW_CHARS, build_history, load_texts, migrate_legacy_rows
+from models import History, HistoryPayload, User
+
+def add_user(session) -> int:
+    user = User(username="ada", email="ada@example.com", hashed_password="x")
+    session.add(user)
+    session.commit()
+    return user.id
+
+def test_history_keeps_a_summary_and_a_compressed_payload(session):
+    user_id = add_user(session)
+    long_input = "requirement " * 100
+    session.add(build_history(user_id, "code_generation", long_input, "print('hi')"))
+    session.commit()
+
+    history = session.query(History).one()
+    assert history.input_preview == long_input[:PREVIEW_CHARS] + "..."
+    assert history.input_size == len(long_input)
+    assert history.output_size == len("print('hi')")
+    assert history.input_text is None
+    assert len(history.payload.input_blob) < len(long_input)
+    assert load_texts(history) == (long_input, "print('hi')")
+
+def test_legacy_rows_are_migrated_in_batches(session, monkeypatch):
+    user_id = add_user(session)
+    session.execute(History.__table__.insert(), [
+        {"user_id": user_id, "request_type": "bug_fix", "input_text": f"input {i}", "output_text": f"output {i}"}
+        for i in range(5)
+    ])
+    session.commit()
+    # A legacy row still reads back before it is migrated
+    assert load_texts(session.query(History).first()) == ("input 0", "output 0")
+
+    monkeypatch.setattr(history_store, "MIGRATION_BATCH_SIZE", 2)
+    with engine.begin() as connection:
+        migrate_legacy_rows(connection)
+
+    session.expire_all()
+    histories = session.query(History).order_by(History.id).all()
+    assert session.query(HistoryPayload).count() == 5
+    for i, history in enumerate(histories):
+        assert history.input_preview == f"input {i}"
+        assert history.input_size == len(f"input {i}")
+        assert history.input_text is None and history.output_text is None
+        assert load_texts(history) == (f"input {i}", f"output {i}")
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from history_writer import HistoryWriter
+from models import History, User
+
+@pytest.fixture
+def user_id(session):
+    user = User(username="ada", email="ada@example.com", hashed_password="x")
+    session.add(user)
+    session.commit()
+    return user.id
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_queued_records_are_flushed_in_batches(session, user_id):
+    writer = HistoryWriter(batch_size=10, flush_interval_ms=50, max_queued=100)
+    writer.start()
+    try:
+        for i in range(25):
+            assert writer.submit(user_id, "code_generation", f"prompt {i}", "output")
+        wait_for(lambda: writer.stats()["written"] == 25)
+    finally:
+        writer.stop()
+    assert session.query(History).filter(History.user_id == user_id).count() == 25
+    stats = writer.stats()
+    assert 3 <= stats["batches"] < 25
+    assert stats["sync_writes"] == 0
+
+def test_stop_writes_everything_still_queued(session, user_id):
+    writer = HistoryWriter(batch_size=100, flush_interval_ms=10000, max_queued=100)
+    writer.start()
+    for i in range(5):
+        writer.submit(user_id, "bug_fix", f"code {i}", "fixed")
+    writer.stop()
+    assert session.query(History).count() == 5
+
+def test_full_queue_is_refused_so_the_caller_writes(session, user_id):
+    writer = HistoryWriter(batch_size=10, flush_interval_ms=50, max_queued=1)
+    # Not started: nothing drains the queue
+    assert not writer.submit(user_id, "code_generation", "prompt", "output")
+    writer.write([(user_id, "code_generation", "prompt", "output")], sync=True)
+    assert session.query(History).count() == 1
+    assert writer.stats()["sync_writes"] == 1
@@ -0,0 +1,43 @@
+import os
+import subprocess
+
+import pytest
+
+import java_runner
+from java_runner import JavaClassCache
+
+@pytest.fixture
+def fake_javac(monkeypatch):
+    """Stand in for javac: write an empty .class file next to each source"""
+    def run(args, **kwargs):
+        build_dir, java_file = args[2], args[3]
+        name = os.path.splitext(os.path.basename(java_file))[0]
+        open(os.path.join(build_dir, f"{name}.class"), "wb").close()
+        return subprocess.CompletedProcess(args, 0, "", "")
+    monkeypatch.setattr(java_runner.subprocess, "run", run)
+
+def test_identical_source_compiles_once(tmp_path, fake_javac):
+    cache = JavaClassCache(str(tmp_path), max_entries=4)
+    first, hold = cache.acquire("class A {}", "A.java")
+    cache.release(hold)
+    second, hold = cache.acquire("class A {}", "A.java")
+    cache.release(hold)
+    assert first == second
+    assert cache.stats()["compiles"] == 1
+    assert cache.stats()["hits"] == 1
+
+def test_eviction_skips_directories_in_use(tmp_path, fake_javac):
+    cache = JavaClassCache(str(tmp_path), max_entries=1)
+    busy, busy_hold = cache.acquire("class A {}", "A.java")
+    idle, idle_hold = cache.acquire("class B {}", "B.java")
+    cache.release(idle_hold)
+    os.utime(idle, (0, 0))
+    os.utime(busy, (0, 0))
+
+    cache.acquire("class C {}", "C.java")
+    assert os.path.isfile(os.path.join(busy, "A.class"))
+    assert not os.path.exists(idle)
+
+    cache.release(busy_hold)
+    cache.acquire("class D {}", "D.java")
+    assert not os.path.exists(busy)
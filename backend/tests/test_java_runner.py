@@ -0,0 +1,48 @@
+import os
+import subprocess
+
+import pytest
+
+import java_runner
+from java_runner import JavaClassCache, JavaRunner
+
+CODE = "public class Main { public static void main(String[] args) {} }"
+
+@pytest.fixture
+def no_java(monkeypatch):
+    """javac writes empty class files; java itself cannot be launched"""
+    def run(args, **kwargs):
+        if args[0] != "javac":
+            raise FileNotFoundError(2, "No such file or directory", "java")
+        build_dir, java_file = args[2], args[3]
+        name = os.path.splitext(os.path.basename(java_file))[0]
+        open(os.path.join(build_dir, f"{name}.class"), "wb").close()
+        return subprocess.CompletedProcess(args, 0, "", "")
+
+    def popen(args, **kwargs):
+        raise FileNotFoundError(2, "No such file or directory", "java")
+
+    monkeypatch.setattr(java_runner.subprocess, "run", run)
+    monkeypatch.setattr(java_runner.subprocess, "Popen", popen)
+
+@pytest.mark.parametrize("use_harness", [True, False])
+def test_missing_java_gives_error_results(tmp_path, no_java, use_harness):
+    runner = JavaRunner(JavaClassCache(str(tmp_path), max_entries=4), use_harness=use_harness)
+    results = runner.run_all(CODE, ["1", "2"])
+    assert len(results) == 2
+    for result in results:
+        assert not result["success"]
+        assert result["error"].startswith("Could not start java")
+    # One fallback for the harness that never started, not one per case
+    assert runner.stats()["harness_fallbacks"] == (1 if use_harness else 0)
+
+def test_harness_compile_error_falls_back_to_cold_runs(tmp_path, no_java, monkeypatch):
+    runner = JavaRunner(JavaClassCache(str(tmp_path), max_entries=4), use_harness=True)
+
+    def broken_harness_dir():
+        raise java_runner.CompileError("SubmissionHarness.java: error")
+
+    monkeypatch.setattr(runner, "harness_dir", broken_harness_dir)
+    results = runner.run_all(CODE, ["1"])
+    assert results[0]["error"].startswith("Could not start java")
+    assert runner.stats()["harness_fallbacks"] == 1
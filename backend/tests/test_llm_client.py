@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+# llm_client builds the provider services at import
+pytest.importorskip("google.generativeai")
+pytest.importorskip("ibm_watson_machine_learning")
+
+import llm_client
+from gemini_service import ERROR_PREFIX
+from llm_client import AsyncGeminiClient, ProviderPool
+from semantic_cache import SemanticCache
+from single_flight import SingleFlight
+from text_features import HashingVectorizer
+
+class FakeGemini:
+    def __init__(self, fail: bool):
+        self.fail = fail
+
+    def get_voice_response_stream(self, text: str):
+        yield "Scrum is an agile "
+        if self.fail:
+            raise RuntimeError("connection reset")
+        yield "framework."
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = SemanticCache(HashingVectorizer(2048), threshold=0.85, max_entries=10, ttl_seconds=3600)
+    monkeypatch.setattr(llm_client, "voice_cache", cache)
+    return cache
+
+def stream_answer(service, text: str) -> list:
+    pool = ProviderPool("test", 2)
+    client = AsyncGeminiClient(service, pool, SingleFlight("test"))
+
+    async def main():
+        return [chunk async for chunk in client.get_voice_response_stream(text)]
+
+    try:
+        return asyncio.run(main())
+    finally:
+        pool.shutdown()
+
+def test_complete_stream_is_cached(cache):
+    assert "".join(stream_answer(FakeGemini(fail=False), "What is Scrum?")) == "Scrum is an agile framework."
+    assert cache.lookup("what is scrum")[0] == "Scrum is an agile framework."
+
+def test_failed_stream_is_not_cached(cache):
+    chunks = stream_answer(FakeGemini(fail=True), "What is Scrum?")
+    assert chunks[0] == "Scrum is an agile "
+    assert chunks[-1] == ERROR_PREFIX + "connection reset"
+    assert cache.lookup("what is scrum") is None
@@ -0,0 +1,43 @@
+import asyncio
+import uuid
+
+from passlib.hash import bcrypt
+
+from auth import BCRYPT_ROUNDS, PasswordHasher
+from models import User
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_hash_uses_the_configured_cost():
+    hasher = PasswordHasher(max_concurrency=2)
+    try:
+        hashed = run(hasher.hash("secret"))
+        assert bcrypt.from_string(hashed).rounds == BCRYPT_ROUNDS
+        assert run(hasher.verify_and_update("secret", hashed)) == (True, None)
+        assert run(hasher.verify_and_update("wrong", hashed)) == (False, None)
+    finally:
+        hasher.shutdown()
+
+def test_hash_at_another_cost_is_replaced():
+    hasher = PasswordHasher(max_concurrency=2)
+    old_hash = bcrypt.using(rounds=4).hash("secret")
+    try:
+        valid, new_hash = run(hasher.verify_and_update("secret", old_hash))
+    finally:
+        hasher.shutdown()
+    assert valid
+    assert bcrypt.from_string(new_hash).rounds == BCRYPT_ROUNDS
+    assert hasher.stats()["rehashed"] == 1
+
+def test_login_rehashes_the_stored_password(client, session):
+    username = f"user-{uuid.uuid4().hex[:8]}"
+    client.post("/register", data={"username": username, "email": f"{username}@example.com", "password": "secret"})
+    user = session.query(User).filter(User.username == username).one()
+    user.hashed_password = bcrypt.using(rounds=4).hash("secret")
+    session.commit()
+
+    assert client.post("/token", data={"username": username, "password": "secret"}).status_code == 200
+    session.expire_all()
+    stored = session.query(User).filter(User.username == username).one().hashed_password
+    assert bcrypt.from_string(stored).rounds == BCRYPT_ROUNDS
@@ -0,0 +1,62 @@
+import io
+import json
+import uuid
+import zipfile
+
+from history_export import iter_export
+from history_store import build_history
+from models import User
+from pdf_export import CHUNK_SIZE, iter_file, pdf_filename, render_pdf
+
+def test_rendered_pdf_streams_in_chunks_and_closes():
+    output = render_pdf("Bug Fix", "line\n" * 2000)
+    chunks = list(iter_file(output))
+    assert chunks[0].startswith(b"%PDF")
+    assert all(len(chunk) <= CHUNK_SIZE for chunk in chunks)
+    assert output.closed
+
+def test_filename_is_safe():
+    assert pdf_filename("Requirements to Code: v2/final") == "Requirements_to_Code_v2_final.pdf"
+
+def add_entries(session, username: str = "ada") -> tuple:
+    user = User(username=username, email=f"{username}@example.com", hashed_password="x")
+    session.add(user)
+    session.commit()
+    entries = [build_history(user.id, "code_generation", f"prompt {i}", f"output {i}") for i in range(3)]
+    session.add_all(entries)
+    session.commit()
+    return user.id, [entry.id for entry in entries]
+
+def test_zip_of_pdfs_holds_only_the_selected_entries(session):
+    user_id, ids = add_entries(session)
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(iter_export(user_id, "zip", "pdf", [ids[0], ids[2]]))))
+    names = archive.namelist()
+    assert len(names) == 2
+    assert all(name.endswith(".pdf") for name in names)
+    assert archive.read(names[0]).startswith(b"%PDF")
+
+def test_jsonl_export_skips_other_users_ids(session):
+    user_id, ids = add_entries(session)
+    _, other_ids = add_entries(session, "bob")
+    lines = b"".join(iter_export(user_id, "jsonl", "md", ids + other_ids)).decode().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ids
+
+def test_history_entry_downloads_as_pdf(client, session):
+    username = f"user-{uuid.uuid4().hex[:8]}"
+    client.post("/register", data={"username": username, "email": f"{username}@example.com", "password": "secret"})
+    token = client.post("/token", data={"username": username, "password": "secret"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = session.query(User.id).filter(User.username == username).scalar()
+    history = build_history(user_id, "bug_fix", "broken code", "fixed code")
+    session.add(history)
+    session.commit()
+
+    response = client.get(f"/api/history/{history.id}/pdf", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["content-disposition"] == 'attachment; filename="Bug_Fix.pdf"'
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert response.content.startswith(b"%PDF")
+
+    _, other_ids = add_entries(session, f"other-{uuid.uuid4().hex[:8]}")
+    assert client.get(f"/api/history/{other_ids[0]}/pdf", headers=headers).status_code == 404
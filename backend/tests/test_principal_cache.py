@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+import auth
+from auth import Principal, PrincipalCache, create_access_token, user_from_token
+from models import User
+
+def test_entries_expire_after_the_ttl():
+    cache = PrincipalCache(ttl_seconds=0.05, max_entries=10)
+    cache.put(Principal(1, "ada"))
+    assert cache.get("ada").id == 1
+    time.sleep(0.1)
+    assert cache.get("ada") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PrincipalCache(ttl_seconds=60, max_entries=2)
+    cache.put(Principal(1, "ada"))
+    cache.put(Principal(2, "bob"))
+    cache.get("ada")
+    cache.put(Principal(3, "cy"))
+    assert cache.get("bob") is None
+    assert cache.get("ada") is not None
+
+def test_zero_ttl_disables_the_cache():
+    cache = PrincipalCache(ttl_seconds=0, max_entries=10)
+    cache.put(Principal(1, "ada"))
+    assert cache.get("ada") is None
+
+@pytest.fixture
+def principal_cache(monkeypatch):
+    cache = PrincipalCache(ttl_seconds=60, max_entries=10)
+    monkeypatch.setattr(auth, "principal_cache", cache)
+    monkeypatch.setattr(auth, "AUTH_STATELESS", False)
+    return cache
+
+def test_tokens_resolve_from_the_cache_until_the_user_changes(session, principal_cache):
+    user = User(username="ada", email="ada@example.com", hashed_password="x")
+    session.add(user)
+    session.commit()
+    token = create_access_token({"sub": "ada", "uid": user.id})
+
+    assert user_from_token(token, session).email == "ada@example.com"
+    assert user_from_token(token, session).email == "ada@example.com"
+    assert principal_cache.stats()["hits"] == 1
+
+    user.email = "ada@example.org"
+    session.commit()
+    assert principal_cache.get("ada") is None
+    assert user_from_token(token, session).email == "ada@example.org"
+
+def test_deleted_user_is_rejected(session, principal_cache):
+    user = User(username="ada", email="ada@example.com", hashed_password="x")
+    session.add(user)
+    session.commit()
+    token = create_access_token({"sub": "ada", "uid": user.id})
+    user_from_token(token, session)
+
+    session.delete(user)
+    session.commit()
+    with pytest.raises(auth.HTTPException) as rejected:
+        user_from_token(token, session)
+    assert rejected.value.status_code == 401
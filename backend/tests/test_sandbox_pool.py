@@ -0,0 +1,63 @@
+import os
+import signal
+import subprocess
+import time
+
+import pytest
+
+from sandbox_pool import SandboxPool, SandboxWorker
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="fork server needs os.fork")
+
+@pytest.fixture
+def pool():
+    pool = SandboxPool(size=1, memory_mb=256)
+    yield pool
+    pool.shutdown()
+
+def test_runs_submission(pool):
+    result = pool.execute("print(input()[::-1])", "hello", timeout=2)
+    assert result["success"]
+    assert result["output"] == "olleh\n"
+
+def test_timeout_applies_after_child_closes_stdio(pool):
+    code = "import os, time\nos.close(1)\nos.close(2)\ntime.sleep(30)"
+    started = time.monotonic()
+    result = pool.execute(code, "", timeout=1)
+    assert result["timed_out"]
+    assert not result["success"]
+    assert time.monotonic() - started < 4
+    # The worker survives and keeps serving jobs
+    assert pool.execute("print(1)", "", timeout=2)["output"] == "1\n"
+
+def process_gone(pid: int) -> bool:
+    """True once pid has exited; an unreaped zombie counts as gone"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] == "Z"
+    except FileNotFoundError:
+        return True
+
+def test_background_children_are_killed(pool):
+    code = (
+        "import os, time\n"
+        "child = os.fork()\n"
+        "if child == 0:\n"
+        "    os.close(1)\n"
+        "    os.close(2)\n"
+        "    time.sleep(30)\n"
+        "print(child)"
+    )
+    result = pool.execute(code, "", timeout=2)
+    assert result["success"]
+    leftover = int(result["output"])
+    time.sleep(0.1)
+    assert process_gone(leftover)
+
+def test_killing_worker_kills_active_job():
+    job = subprocess.Popen(["sleep", "30"], start_new_session=True)
+    worker = SandboxWorker()
+    worker.active_pid = job.pid
+    worker.kill()
+    assert job.wait(timeout=2) == -signal.SIGKILL
+    assert not worker.alive()
@@ -0,0 +1,32 @@
+from semantic_cache import SemanticCache
+from text_features import HashingVectorizer
+
+def make_cache(n_features: int = 2048) -> SemanticCache:
+    return SemanticCache(HashingVectorizer(n_features), threshold=0.85, max_entries=100, ttl_seconds=3600)
+
+def test_paraphrase_hits():
+    cache = make_cache()
+    cache.store("What is sprint planning in Scrum?", "planning answer")
+    answer, score = cache.lookup("explain scrum sprint planning")
+    assert answer == "planning answer"
+    assert score >= 0.85
+
+def test_unrelated_question_misses():
+    cache = make_cache()
+    cache.store("What is sprint planning in Scrum?", "planning answer")
+    assert cache.lookup("What is a sprint retrospective?") is None
+
+def test_hash_collision_does_not_match():
+    vectorizer = HashingVectorizer(2048)
+    # These two terms share a bucket, so their hashed vectors are identical
+    assert vectorizer.index("bdd") == vectorizer.index("deployment")
+    cache = make_cache()
+    cache.store("what is bdd", "BDD answer")
+    assert cache.lookup("what is deployment") is None
+    assert cache.lookup("What is BDD?")[0] == "BDD answer"
+
+def test_purge_empties_the_cache():
+    cache = make_cache()
+    cache.store("what is kanban", "kanban answer")
+    assert cache.purge() == 1
+    assert cache.lookup("what is kanban") is None
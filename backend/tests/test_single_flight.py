@@ -0,0 +1,90 @@
+import asyncio
+
+from single_flight import SingleFlight
+
+class Upstream:
+    """Fake provider that counts calls and answers after a short wait"""
+
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+
+    async def call(self):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        if self.fail:
+            raise RuntimeError("provider down")
+        return "answer"
+
+    async def stream(self):
+        self.calls += 1
+        for chunk in ("a", "b", "c"):
+            await asyncio.sleep(0.01)
+            yield chunk
+
+async def collect(stream) -> str:
+    return "".join([chunk async for chunk in stream])
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    flights, upstream = SingleFlight("test"), Upstream()
+
+    async def main():
+        return await asyncio.gather(*(flights.run("key", upstream.call) for _ in range(10)))
+
+    assert asyncio.run(main()) == ["answer"] * 10
+    assert upstream.calls == 1
+    stats = flights.stats()
+    assert stats["upstream_calls"] == 1
+    assert stats["coalesced"] == 9
+    assert stats["in_flight"] == 0
+
+def test_different_keys_and_later_calls_go_upstream():
+    flights, upstream = SingleFlight("test"), Upstream()
+
+    async def main():
+        await asyncio.gather(flights.run("a", upstream.call), flights.run("b", upstream.call))
+        await flights.run("a", upstream.call)
+
+    asyncio.run(main())
+    assert upstream.calls == 3
+
+def test_every_waiter_receives_the_exception():
+    flights, upstream = SingleFlight("test"), Upstream(fail=True)
+
+    async def main():
+        return await asyncio.gather(*(flights.run("key", upstream.call) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert upstream.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+def test_cancelled_waiter_does_not_cancel_the_call():
+    flights, upstream = SingleFlight("test"), Upstream()
+
+    async def main():
+        first = asyncio.ensure_future(flights.run("key", upstream.call))
+        second = asyncio.ensure_future(flights.run("key", upstream.call))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "answer"
+    assert upstream.calls == 1
+
+def test_concurrent_identical_streams_share_one_upstream_stream():
+    flights, upstream = SingleFlight("test"), Upstream()
+
+    async def main():
+        return await asyncio.gather(*(collect(flights.stream("key", upstream.stream)) for _ in range(10)))
+
+    assert asyncio.run(main()) == ["abc"] * 10
+    assert upstream.calls == 1
+
+def test_disabled_calls_upstream_every_time():
+    flights, upstream = SingleFlight("test", enabled=False), Upstream()
+
+    async def main():
+        await asyncio.gather(*(flights.run("key", upstream.call) for _ in range(3)))
+
+    asyncio.run(main())
+    assert upstream.calls == 3
@@ -0,0 +1,60 @@
+from token_budget import MARKER_TOKENS, TaskBudget, TokenBudgeter, estimate_tokens, truncate_middle
+
+def code(lines: int, every: int = 40) -> str:
+    body = []
+    for i in range(lines):
+        body.append(f"def handler_{i}(request):" if i % every == 0 else f"    value_{i} = compute(request, {i})")
+    return "\n".join(body)
+
+def test_short_text_is_untouched():
+    text = code(5)
+    assert truncate_middle(text, 1000) == text
+
+def test_truncation_keeps_head_tail_and_outline_within_budget():
+    text = code(400)
+    truncated = truncate_middle(text, 600)
+    assert estimate_tokens(truncated) <= 600
+    lines = truncated.split("\n")
+    original = text.split("\n")
+    assert lines[0] == original[0]
+    assert lines[-1] == original[-1]
+    assert any("lines omitted" in line for line in lines)
+    # Definitions from the omitted middle survive as an outline
+    assert "def handler_200(request):" in lines
+
+def test_oversized_outline_gives_way_to_the_tail():
+    text = code(400, every=2)
+    lines = truncate_middle(text, 600).split("\n")
+    assert "def handler_200(request):" not in lines
+    assert lines[-1] == text.split("\n")[-1]
+
+def test_single_huge_line_is_cut_by_characters():
+    truncated = truncate_middle("x" * 100000, 100)
+    assert truncated.endswith("[truncated] ...")
+    assert len(truncated) < 1000
+
+def test_fit_shares_the_budget_and_keeps_small_inputs_whole():
+    budgeter = TokenBudgeter({"requirement_tests": TaskBudget(max_input_tokens=500, max_new_tokens=100)})
+    requirements = "The service must reverse strings."
+    inputs, truncated = budgeter.fit("requirement_tests", {"requirements": requirements, "code": code(400)})
+    assert truncated
+    assert inputs["requirements"] == requirements
+    assert estimate_tokens(inputs["code"]) <= 500 - estimate_tokens(requirements)
+    assert estimate_tokens(inputs["requirements"]) + estimate_tokens(inputs["code"]) <= 500
+
+def test_inputs_within_budget_are_returned_as_is():
+    budgeter = TokenBudgeter({"code": TaskBudget(max_input_tokens=500, max_new_tokens=100)})
+    inputs = {"prompt": "reverse a string"}
+    assert budgeter.fit("code", inputs) == (inputs, False)
+
+def test_usage_is_recorded_per_task():
+    budgeter = TokenBudgeter({"code": TaskBudget(max_input_tokens=500, max_new_tokens=100)})
+    budgeter.record("code", "prompt text", "response text", truncated=True)
+    stats = budgeter.stats()["code"]
+    assert stats["requests"] == 1
+    assert stats["truncated"] == 1
+    assert stats["max_new_tokens"] == 100
+    assert stats["input_tokens"]["count"] == 1
+
+def test_marker_fits_in_the_reserved_tokens():
+    assert estimate_tokens("... [12345 lines omitted] ...") <= MARKER_TOKENS
@@ -0,0 +1,42 @@
+import pytest
+
+from topic_filter import TopicFilter, SDLC_TERMS, OFF_TOPIC_TERMS, topic_filter
+
+@pytest.mark.parametrize("question", [
+    "What is a cat command in linux?",
+    "How do I use pip to install a package in Python?",
+    "How do I write a shell script to back up files?",
+    "What does grep do?",
+    "Is Java or Python better for backend services?",
+    "What is Scrum?",
+])
+def test_programming_and_tool_questions_are_not_refused(question):
+    assert not topic_filter.is_off_topic(question)
+
+@pytest.mark.parametrize("question", [
+    "What is the weather in London?",
+    "Tell me a joke",
+    "Give me a pizza recipe",
+])
+def test_clearly_off_topic_questions_are_refused(question):
+    assert topic_filter.is_off_topic(question)
+
+def test_eval_set_never_refuses_an_on_topic_question():
+    report = topic_filter.evaluate()
+    assert report["wrongly_refused"] == []
+    assert report["recall"] >= 0.9
+
+def test_term_lists_have_no_duplicates():
+    for terms in (SDLC_TERMS, OFF_TOPIC_TERMS):
+        words = [word for group in terms.values() for word in group.split()]
+        assert len(words) == len(set(words))
+
+def test_disabled_filter_refuses_nothing():
+    assert not TopicFilter(threshold=0.9, enabled=False).is_off_topic("Tell me a joke")
+
+def test_terms_are_matched_exactly():
+    # These used to share hash buckets with SDLC terms
+    assert "who" not in topic_filter.on_weights
+    assert "state" not in topic_filter.on_weights
+    assert topic_filter.on_weights["ansible"] == 1.0
+    assert not topic_filter.is_off_topic("Who maintains Ansible playbooks?")
@@ -0,0 +1,47 @@
+from models import ChallengeAttempt, CodingProblem, User, UserStats
+from user_stats import load_user_stats
+
+def add_problems(session):
+    easy = CodingProblem(title="Two Sum", difficulty="Easy", language="Python", test_cases="[]")
+    hard = CodingProblem(title="Median", difficulty="Hard", language="Python", test_cases="[]")
+    user = User(username="ada", email="ada@example.com", hashed_password="x")
+    session.add_all([easy, hard, user])
+    session.commit()
+    return user, easy, hard
+
+def attempt(session, user, problem, passed):
+    session.add(ChallengeAttempt(user_id=user.id, problem_id=problem.id, code="", language="python", passed=passed))
+    session.commit()
+
+def test_attempts_update_the_stats_row(session):
+    user, easy, hard = add_problems(session)
+    attempt(session, user, easy, True)
+    attempt(session, user, hard, False)
+    attempt(session, user, hard, True)
+    assert load_user_stats(session, user.id) == {
+        "total_attempts": 3,
+        "passed": 2,
+        "failed": 1,
+        "difficulty_stats": {"Easy": 1, "Medium": 0, "Hard": 1}
+    }
+
+def test_missing_row_is_backfilled_from_attempts(session):
+    user, easy, hard = add_problems(session)
+    # Attempts recorded before the stats table existed bypass the ORM events
+    session.execute(ChallengeAttempt.__table__.insert(), [
+        {"user_id": user.id, "problem_id": easy.id, "passed": True},
+        {"user_id": user.id, "problem_id": easy.id, "passed": False},
+    ])
+    session.commit()
+    assert session.get(UserStats, user.id) is None
+    stats = load_user_stats(session, user.id)
+    assert stats["total_attempts"] == 2
+    assert stats["difficulty_stats"]["Easy"] == 1
+
+def test_changing_difficulty_rebuilds_stats(session):
+    user, easy, hard = add_problems(session)
+    attempt(session, user, easy, True)
+    easy.difficulty = "Medium"
+    session.commit()
+    session.expire_all()
+    assert load_user_stats(session, user.id)["difficulty_stats"] == {"Easy": 0, "Medium": 1, "Hard": 0}
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import CodingProblem
+from verdict_cache import VerdictCache
+
+CODE = "def reverse_string(s):\n    return s[::-1]\n"
+GRADING = {"results": [{"input": "hello", "expected": "olleh", "actual": "olleh", "passed": True}], "all_passed": True}
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+@pytest.fixture
+def problem(db):
+    problem = CodingProblem(
+        title="Reverse String", description="", difficulty="Easy", language="Python",
+        test_cases=json.dumps([{"input": "hello", "output": "olleh"}])
+    )
+    db.add(problem)
+    db.commit()
+    return problem
+
+def test_resubmission_hits(db, problem):
+    cache = VerdictCache()
+    assert cache.lookup(db, problem, "python", CODE) is None
+    cache.store(db, problem, "python", CODE, GRADING)
+    db.commit()
+    # Line endings and trailing whitespace do not change the verdict
+    resubmitted = CODE.replace("\n", "   \r\n")
+    assert cache.lookup(db, problem, "Python", resubmitted) == GRADING
+    assert cache.stats()["hits"] == 1
+
+def test_changed_code_misses(db, problem):
+    cache = VerdictCache()
+    cache.store(db, problem, "python", CODE, GRADING)
+    db.commit()
+    assert cache.lookup(db, problem, "python", CODE.replace("[::-1]", "[::1]")) is None
+    assert cache.lookup(db, problem, "java", CODE) is None
+    assert cache.stats()["misses"] == 2
+
+def test_editing_test_cases_drops_verdicts(db, problem):
+    cache = VerdictCache()
+    cache.store(db, problem, "python", CODE, GRADING)
+    db.commit()
+    problem.test_cases = json.dumps([{"input": "abc", "output": "cba"}])
+    db.commit()
+    assert cache.lookup(db, problem, "python", CODE) is None
+
+def test_timeouts_are_not_stored(db, problem):
+    cache = VerdictCache()
+    timed_out = {"results": [{"passed": False, "error": "Execution timed out"}], "all_passed": False}
+    cache.store(db, problem, "python", CODE, timed_out)
+    db.commit()
+    assert cache.lookup(db, problem, "python", CODE) is None
@@ -0,0 +1,68 @@
+import re
+import zlib
+import numpy as np
+
+# Filler that changes how a question is phrased but not what it asks.
+# Negations are deliberately absent: "is waterfall agile" and "is waterfall
+# not agile" must not look alike.
+STOPWORDS = frozenset("""
+a an the and or of to in on for with by at from as into about over
+is are was were be been being do does did can could should would will shall may might must
+i me my we our you your it its this that these those there here
+what whats which
+explain describe define definition meaning mean means tell give show list
+please briefly quick quickly simple simply short overview summary summarize
+let us lets know understand help question questions between
+""".split())
+
+# Ways of asking for a comparison, folded onto one token
+SYNONYMS = {
+    "vs": "versus",
+    "difference": "versus",
+    "differences": "versus",
+    "compare": "versus",
+    "comparison": "versus",
+}
+
+_NON_WORD = re.compile(r"[^a-z0-9\s]+")
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    text = (text or "").lower().replace("-", " ").replace("'", "")
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+def stem(token: str) -> str:
+    """Fold simple English plurals so "sprints" matches "sprint" """
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> list:
+    tokens = []
+    for token in normalize(text).split():
+        if token in STOPWORDS:
+            continue
+        tokens.append(SYNONYMS.get(token, stem(token)))
+    return tokens
+
+class HashingVectorizer:
+    """Maps text to fixed-width term-frequency vectors via a stable token hash"""
+
+    def __init__(self, n_features: int = 2048):
+        self.n_features = n_features
+
+    def index(self, token: str) -> int:
+        # crc32 rather than hash(): str hashes are salted per process
+        return zlib.crc32(token.encode()) % self.n_features
+
+    def transform(self, text: str) -> np.ndarray:
+        """Sublinear (1 + log tf) counts as a float32 vector"""
+        vector = np.zeros(self.n_features, dtype=np.float32)
+        tokens = tokenize(text)
+        if not tokens:
+            return vector
+        indices, counts = np.unique([self.index(token) for token in tokens], return_counts=True)
+        vector[indices] = 1 + np.log(counts)
+        return vector
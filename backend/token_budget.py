@@ -0,0 +1,152 @@
+import os
+import re
+import threading
+from dotenv import load_dotenv
+
+from metrics import Histogram, metrics_registry
+
+load_dotenv()
+
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000)
+
+MARKER_TOKENS = 20
+
+_PIECES = re.compile(r"\w+|[^\w\s]|\n")
+# Lines kept from the omitted middle of truncated code so the model still sees its shape
+_OUTLINE = re.compile(
+    r"^\s*(@|(async\s+def|def|class|function|interface|public|private|protected|static|export)\b)"
+)
+
+def estimate_tokens(text) -> int:
+    """Rough Granite token count: words split into ~4 character pieces, punctuation and newlines count one each"""
+    if not text:
+        return 0
+    return sum((len(piece) + 3) // 4 if piece[0].isalnum() or piece[0] == "_" else 1
+               for piece in _PIECES.findall(str(text)))
+
+def truncate_middle(text: str, max_tokens: int) -> str:
+    """Keep whole lines from the head and tail, replacing the middle with an outline of its definitions"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    lines = text.split("\n")
+    # Leave room for the omission marker
+    budget = max(max_tokens - MARKER_TOKENS, 0)
+    head, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget * 2 // 3:
+            break
+        head.append(line)
+        used += cost
+    if not head:
+        # One enormous line, e.g. minified code: cut by characters instead
+        return text[:budget * 3] + "\n... [truncated] ..."
+    rest = lines[len(head):]
+    # Reserve room for the outline before the tail takes the rest, unless it
+    # would crowd the tail out
+    outline = [i for i, line in enumerate(rest) if _OUTLINE.match(line)]
+    outline_cost = sum(estimate_tokens(rest[i]) + 1 for i in outline)
+    if used + outline_cost > budget * 5 // 6:
+        outline, outline_cost = [], 0
+    tail = []
+    for line in reversed(rest):
+        cost = estimate_tokens(line) + 1
+        if used + outline_cost + cost > budget:
+            break
+        tail.insert(0, line)
+        used += cost
+    middle = rest[:len(rest) - len(tail)]
+    outline = [middle[i] for i in outline if i < len(middle)]
+    marker = f"... [{len(middle) - len(outline)} lines omitted] ..."
+    return "\n".join(head + outline + [marker] + tail)
+
+class TaskBudget:
+    """Token limits for one prompt template: its inputs and the generated response"""
+
+    def __init__(self, max_input_tokens: int, max_new_tokens: int):
+        self.max_input_tokens = max_input_tokens
+        self.max_new_tokens = max_new_tokens
+
+    @classmethod
+    def from_env(cls, task: str, max_input_tokens: int, max_new_tokens: int):
+        prefix = f"TOKEN_BUDGET_{task.upper()}_"
+        return cls(
+            int(os.getenv(prefix + "INPUT_TOKENS", str(max_input_tokens))),
+            int(os.getenv(prefix + "NEW_TOKENS", str(max_new_tokens)))
+        )
+
+class TokenBudgeter:
+    """Per-task token budgets for Granite requests, and what each request used.
+
+    Inputs over a task's budget are cut down before the prompt is rendered:
+    the budget is shared out so small inputs stay whole and only the large
+    ones are truncated. Counts are local estimates, recorded for upstream
+    calls only.
+    """
+
+    def __init__(self, budgets: dict):
+        self.budgets = budgets
+        self._lock = threading.Lock()
+        self._usage = {
+            task: {
+                "requests": 0,
+                "truncated": 0,
+                "input_tokens": Histogram(TOKEN_BUCKETS, unit="tokens"),
+                "output_tokens": Histogram(TOKEN_BUCKETS, unit="tokens")
+            }
+            for task in budgets
+        }
+
+    def max_new_tokens(self, task: str) -> int:
+        return self.budgets[task].max_new_tokens
+
+    def fit(self, task: str, inputs: dict):
+        """Return (inputs, truncated) with the inputs cut down to the task's input budget"""
+        sizes = {name: estimate_tokens(value) for name, value in inputs.items()}
+        remaining = self.budgets[task].max_input_tokens
+        if sum(sizes.values()) <= remaining:
+            return inputs, False
+        fitted = dict(inputs)
+        # Smallest first, so every input that fits its share is kept intact
+        for left, name in enumerate(sorted(sizes, key=sizes.get)):
+            share = remaining // (len(sizes) - left)
+            if sizes[name] > share:
+                fitted[name] = truncate_middle(str(inputs[name]), share)
+            remaining -= min(sizes[name], share)
+        return fitted, True
+
+    def record(self, task: str, prompt: str, response: str, truncated: bool):
+        usage = self._usage[task]
+        usage["input_tokens"].observe(estimate_tokens(prompt))
+        usage["output_tokens"].observe(estimate_tokens(response))
+        with self._lock:
+            usage["requests"] += 1
+            if truncated:
+                usage["truncated"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {task: (usage["requests"], usage["truncated"]) for task, usage in self._usage.items()}
+        return {
+            task: {
+                "max_input_tokens": self.budgets[task].max_input_tokens,
+                "max_new_tokens": self.budgets[task].max_new_tokens,
+                "requests": counts[task][0],
+                "truncated": counts[task][1],
+                "input_tokens": usage["input_tokens"].snapshot(),
+                "output_tokens": usage["output_tokens"].snapshot()
+            }
+            for task, usage in self._usage.items()
+        }
+
+token_budgeter = TokenBudgeter({
+    "code": TaskBudget.from_env("code", max_input_tokens=2000, max_new_tokens=1500),
+    "test_cases": TaskBudget.from_env("test_cases", max_input_tokens=3000, max_new_tokens=1500),
+    "bug_fix": TaskBudget.from_env("bug_fix", max_input_tokens=3000, max_new_tokens=2000),
+    "documentation": TaskBudget.from_env("documentation", max_input_tokens=2000, max_new_tokens=1500),
+    "implementation": TaskBudget.from_env("implementation", max_input_tokens=2000, max_new_tokens=2000),
+    # Receives the generated implementation, so its code input is the one usually cut
+    "requirement_tests": TaskBudget.from_env("requirement_tests", max_input_tokens=3000, max_new_tokens=1500),
+    "uml": TaskBudget.from_env("uml", max_input_tokens=1500, max_new_tokens=800)
+})
+metrics_registry.register("token_budget", token_budgeter.stats)
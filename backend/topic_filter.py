@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import argparse
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+from text_features import tokenize
+from metrics import metrics_registry
+
+load_dotenv()
+
+OFF_TOPIC_REFUSAL = (
+    "I can only help with software development and SDLC related questions. "
+    "Please ask me about development processes, methodologies, or best practices."
+)
+
+EVAL_SET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "voice_topic_eval.jsonl")
+
+# Terms that put a question on topic. Words that are also common outside
+# software ("story", "model", "plan") get lower weights.
+SDLC_TERMS = {
+    1.0: """
+        software development developer sdlc lifecycle agile scrum kanban waterfall sprint backlog
+        requirement specification architecture testing tester deployment deploy devops pipeline
+        code coding programming programmer bug debug debugging defect refactor refactoring
+        repository git commit merge branch uml stakeholder velocity retrospective standup epic
+        api database microservice docker kubernetes container qa prototype spiral xp
+        tdd bdd regression acceptance integration milestone scalability maintainability
+        documentation compiler algorithm frontend backend framework library jira devsecops
+        iteration iterative incremental methodology usability sla rollout rollback hotfix
+        versioning changelog ci cd unit automation automated
+        python java javascript typescript kotlin golang rust ruby php perl scala csharp cpp sql
+        html css json yaml xml regex react angular node npm pip maven gradle
+        linux unix ubuntu windows macos shell bash zsh powershell terminal command cli
+        grep sed awk ssh chmod sudo kernel github gitlab bitbucket jenkins terraform ansible
+        compile runtime syntax function variable loop array exception stacktrace script
+        ide vscode intellij vim editor debugger linter
+    """,
+    0.6: """
+        test design release version review maintenance project estimate estimation risk scope
+        feature technical debt server client cloud security monitoring incident configuration
+        process workflow practice tool team requirements quality data system application app
+        performance user story model plan planning phase stage lean pair owner master
+    """,
+}
+
+# Terms that mark a question as clearly about something else
+OFF_TOPIC_TERMS = {
+    1.0: """
+        weather rain snow forecast recipe cook cooking bake baking pizza pasta coffee wine beer
+        movie film actor actress celebrity song music singer lyric album concert football
+        soccer cricket basketball tennis olympics joke funny horoscope zodiac astrology dating
+        girlfriend boyfriend marriage wedding vacation hotel flight tourist holiday birthday
+        gift pet dog cat puppy kitten animal planet moon ocean mountain river fashion clothes
+        shopping diet calorie workout gym yoga president election politic politician capital
+        country religion god poem poetry novel painting dinner lunch breakfast
+    """,
+    0.5: """
+        history war king queen car weight sleep health doctor medicine food drink travel
+        city sport game weekend family friend love money salary
+    """,
+}
+
+class TopicFilter:
+    """Cheap local check that turns away clearly off-topic voice questions.
+
+    Each distinct stemmed token of a question is looked up in the SDLC and
+    off-topic term weights, and the two sums feed a logistic score: the
+    probability that the question is off topic. Only questions above the
+    threshold are refused locally. Questions matching neither list stay
+    near 0.5 and go to the model as before.
+    """
+
+    def __init__(self, threshold: float, enabled: bool = True):
+        self.threshold = threshold
+        self.enabled = enabled
+        self.on_weights = self._weights(SDLC_TERMS)
+        self.off_weights = self._weights(OFF_TOPIC_TERMS)
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._avoided = 0
+
+    @staticmethod
+    def _weights(terms: dict) -> dict:
+        """{stemmed term: weight}, tokenized the same way as questions"""
+        weights = {}
+        for weight, words in terms.items():
+            for token in tokenize(words):
+                weights[token] = max(weights.get(token, 0.0), weight)
+        return weights
+
+    def off_topic_scores(self, texts: list) -> np.ndarray:
+        """Probability that each text is off topic"""
+        tokens = [set(tokenize(text)) for text in texts]
+        on = np.array([sum(self.on_weights.get(token, 0.0) for token in t) for t in tokens])
+        off = np.array([sum(self.off_weights.get(token, 0.0) for token in t) for t in tokens])
+        # Any SDLC term outweighs about two off-topic ones
+        return 1 / (1 + np.exp(-(3.0 * off - 6.0 * on)))
+
+    def is_off_topic(self, text: str) -> bool:
+        if not self.enabled:
+            return False
+        off_topic = bool(self.off_topic_scores([text])[0] >= self.threshold)
+        with self._lock:
+            self._checked += 1
+            if off_topic:
+                self._avoided += 1
+        return off_topic
+
+    def evaluate(self, path: str = EVAL_SET) -> dict:
+        """Precision/recall of refusing off-topic questions on a labelled JSONL set"""
+        with open(path) as f:
+            samples = [json.loads(line) for line in f if line.strip()]
+        predicted = self.off_topic_scores([s["text"] for s in samples]) >= self.threshold
+        actual = np.array([not s["on_topic"] for s in samples])
+        true_positives = int(np.sum(predicted & actual))
+        refused = int(np.sum(predicted))
+        off_topic = int(np.sum(actual))
+        return {
+            "samples": len(samples),
+            "threshold": self.threshold,
+            "precision": round(true_positives / refused, 4) if refused else 1.0,
+            "recall": round(true_positives / off_topic, 4) if off_topic else 1.0,
+            "wrongly_refused": [s["text"] for s, p, a in zip(samples, predicted, actual) if p and not a],
+            "missed": [s["text"] for s, p, a in zip(samples, predicted, actual) if a and not p]
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "checked": self._checked,
+                "avoided_calls": self._avoided
+            }
+
+topic_filter = TopicFilter(
+    threshold=float(os.getenv("TOPIC_FILTER_THRESHOLD", "0.9")),
+    enabled=os.getenv("TOPIC_FILTER_ENABLED", "true").lower() == "true"
+)
+metrics_registry.register("topic_filter", topic_filter.stats)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the voice assistant topic filter")
+    parser.add_argument("--data", default=EVAL_SET, help="labelled JSONL file")
+    parser.add_argument("--threshold", type=float, default=topic_filter.threshold)
+    args = parser.parse_args()
+    topic_filter.threshold = args.threshold
+    json.dump(topic_filter.evaluate(args.data), sys.stdout, indent=2)
+    print()
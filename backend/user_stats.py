@@ -0,0 +1,91 @@
+from datetime import datetime
+from sqlalchemy import event, inspect, select, update, func, case
+from sqlalchemy.exc import IntegrityError
+
+from models import ChallengeAttempt, CodingProblem, UserStats
+
+DIFFICULTY_COLUMNS = {
+    "Easy": "passed_easy",
+    "Medium": "passed_medium",
+    "Hard": "passed_hard"
+}
+
+def aggregate_stats(connection, user_id: int) -> dict:
+    """Compute a user's counters from their attempts with one GROUP BY join"""
+    rows = connection.execute(
+        select(
+            CodingProblem.difficulty,
+            func.count(ChallengeAttempt.id),
+            func.sum(case((ChallengeAttempt.passed, 1), else_=0))
+        )
+        .select_from(ChallengeAttempt)
+        .outerjoin(CodingProblem, CodingProblem.id == ChallengeAttempt.problem_id)
+        .where(ChallengeAttempt.user_id == user_id)
+        .group_by(CodingProblem.difficulty)
+    ).all()
+
+    values = {"total_attempts": 0, "passed": 0, **{column: 0 for column in DIFFICULTY_COLUMNS.values()}}
+    for difficulty, attempts, passed in rows:
+        passed = passed or 0
+        values["total_attempts"] += attempts
+        values["passed"] += passed
+        if difficulty in DIFFICULTY_COLUMNS:
+            values[DIFFICULTY_COLUMNS[difficulty]] += passed
+    return values
+
+def _insert_stats(connection, user_id: int) -> bool:
+    """Backfill a user's stats row; False if another writer created it first"""
+    savepoint = connection.begin_nested()
+    try:
+        connection.execute(UserStats.__table__.insert().values(
+            user_id=user_id, updated_at=datetime.utcnow(), **aggregate_stats(connection, user_id)
+        ))
+        savepoint.commit()
+        return True
+    except IntegrityError:
+        savepoint.rollback()
+        return False
+
+def load_user_stats(db, user_id: int) -> dict:
+    stats = db.get(UserStats, user_id)
+    if stats is None:
+        # Users with attempts from before the stats table existed
+        _insert_stats(db.connection(), user_id)
+        db.commit()
+        stats = db.get(UserStats, user_id)
+
+    return {
+        "total_attempts": stats.total_attempts,
+        "passed": stats.passed,
+        "failed": stats.total_attempts - stats.passed,
+        "difficulty_stats": {
+            difficulty: getattr(stats, column) for difficulty, column in DIFFICULTY_COLUMNS.items()
+        }
+    }
+
+@event.listens_for(ChallengeAttempt, "after_insert")
+def _count_attempt(mapper, connection, attempt):
+    """Keep the user's stats row in step with every recorded attempt"""
+    increments = {"total_attempts": UserStats.total_attempts + 1, "updated_at": datetime.utcnow()}
+    if attempt.passed:
+        increments["passed"] = UserStats.passed + 1
+        difficulty = connection.execute(
+            select(CodingProblem.difficulty).where(CodingProblem.id == attempt.problem_id)
+        ).scalar()
+        column = DIFFICULTY_COLUMNS.get(difficulty)
+        if column:
+            increments[column] = getattr(UserStats, column) + 1
+
+    statement = update(UserStats).where(UserStats.user_id == attempt.user_id).values(**increments)
+    if connection.execute(statement).rowcount:
+        return
+    # No row yet: build it from the attempts table, which already includes this one
+    if not _insert_stats(connection, attempt.user_id):
+        connection.execute(statement)
+
+@event.listens_for(CodingProblem, "after_update")
+def _reset_stats(mapper, connection, problem):
+    """Rebuild stats for everyone who attempted a problem whose difficulty changed"""
+    if inspect(problem).attrs.difficulty.history.has_changes():
+        attempted = select(ChallengeAttempt.user_id).where(ChallengeAttempt.problem_id == problem.id)
+        connection.execute(UserStats.__table__.delete().where(UserStats.user_id.in_(attempted)))
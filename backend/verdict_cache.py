@@ -0,0 +1,107 @@
+import os
+import json
+import hashlib
+import threading
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from dotenv import load_dotenv
+
+from models import CodingProblem, SubmissionVerdict
+from metrics import metrics_registry
+
+load_dotenv()
+
+def normalize_source(code: str) -> str:
+    """Ignore line-ending and trailing-whitespace differences between resubmissions"""
+    lines = (code or "").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+def test_set_version(problem: CodingProblem) -> str:
+    return hashlib.sha256((problem.test_cases or "").encode()).hexdigest()
+
+class VerdictCache:
+    """Stored grading results for byte-identical resubmissions.
+
+    Entries are keyed by problem, test-case-set version, language and the
+    hash of the normalized source, so editing a problem's test cases makes
+    every older verdict unreachable; they are also deleted when it happens.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stored = 0
+
+    @staticmethod
+    def _key(problem: CodingProblem, language: str, code: str) -> dict:
+        return {
+            "problem_id": problem.id,
+            "test_set_version": test_set_version(problem),
+            "language": (language or "").lower(),
+            "source_hash": hashlib.sha256(normalize_source(code).encode()).hexdigest()
+        }
+
+    def lookup(self, db, problem: CodingProblem, language: str, code: str):
+        """Return the cached grading result, or None"""
+        if not self.enabled:
+            return None
+        verdict = db.query(SubmissionVerdict).filter_by(**self._key(problem, language, code)).first()
+        with self._lock:
+            if verdict is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        verdict.hit_count = (verdict.hit_count or 0) + 1
+        return {"results": json.loads(verdict.results), "all_passed": verdict.all_passed}
+
+    @staticmethod
+    def cacheable(grading: dict) -> bool:
+        # Partial (fail-fast) runs and load-dependent failures are not verdicts
+        for result in grading["results"]:
+            if result.get("skipped"):
+                return False
+            error = result.get("error") or ""
+            if "timed out" in error or error.startswith("Sandbox error"):
+                return False
+        return True
+
+    def store(self, db, problem: CodingProblem, language: str, code: str, grading: dict):
+        if not self.enabled or not self.cacheable(grading):
+            return
+        db.add(SubmissionVerdict(
+            **self._key(problem, language, code),
+            results=json.dumps(grading["results"]),
+            all_passed=grading["all_passed"]
+        ))
+        try:
+            db.flush()
+        except IntegrityError:
+            # A concurrent identical submission stored the same verdict first
+            db.rollback()
+            return
+        with self._lock:
+            self._stored += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "stored": self._stored
+            }
+
+@event.listens_for(CodingProblem, "after_update")
+def _invalidate_verdicts(mapper, connection, problem):
+    """Drop stored verdicts when a problem's test cases change"""
+    if inspect(problem).attrs.test_cases.history.has_changes():
+        connection.execute(
+            SubmissionVerdict.__table__.delete().where(SubmissionVerdict.problem_id == problem.id)
+        )
+
+verdict_cache = VerdictCache(enabled=os.getenv("VERDICT_CACHE_ENABLED", "true").lower() == "true")
+metrics_registry.register("verdict_cache", verdict_cache.stats)
@@ -68,7 +68,7 @@ async function runCode() {
     resultsDiv.innerHTML = '<p style="text-align: center; color: var(--primary);">Running tests...</p>';
 
     try {
-        const response = await fetchWithAuth('/api/execute-code', {
+        const response = await fetchWithAuth('/api/submissions', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -80,7 +80,15 @@ async function runCode() {
             })
         });
 
-        const data = await response.json();
+        const job = await response.json();
+        if (!response.ok) {
+            throw new Error(job.detail || 'Submission failed');
+        }
+
+        const data = await waitForSubmission(job.job_id);
+        if (data.status === 'failed') {
+            throw new Error(data.error || 'Grading failed');
+        }
         displayResults(data);
         
         // Reload stats
@@ -90,6 +98,79 @@ async function runCode() {
     }
 }
 
+// Give up on a submission that has not finished after this long
+const SUBMISSION_TIMEOUT_MS = 120000;
+
+// Follow a queued submission over a WebSocket, falling back to polling
+function waitForSubmission(jobId) {
+    return new Promise((resolve, reject) => {
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const socket = new WebSocket(`${protocol}//${window.location.host}/ws/submissions/${jobId}`);
+        const deadline = Date.now() + SUBMISSION_TIMEOUT_MS;
+        let finished = false;
+        let total = 0;
+        let completed = 0;
+
+        const fallBack = () => {
+            if (!finished) {
+                finished = true;
+                pollSubmission(jobId, deadline).then(resolve, reject);
+            }
+        };
+
+        // Authenticate with the first message rather than the URL
+        socket.onopen = () => {
+            socket.send(JSON.stringify({ token: localStorage.getItem('token') }));
+        };
+        socket.onmessage = (message) => {
+            const event = JSON.parse(message.data);
+            if (event.event === 'snapshot') {
+                total = event.total_cases;
+                completed = event.completed_cases;
+                if (event.status === 'completed' || event.status === 'failed') {
+                    finished = true;
+                    resolve(event);
+                    return;
+                }
+            } else if (event.event === 'case') {
+                completed += 1;
+            } else if (event.event === 'completed' || event.event === 'failed') {
+                finished = true;
+                resolve({ ...event, status: event.event });
+                return;
+            }
+            showProgress(event.status === 'queued' ? 'queued' : 'running', completed, total);
+        };
+        socket.onerror = () => {
+            console.warn('Submission updates unavailable, polling instead');
+            fallBack();
+            socket.close();
+        };
+        socket.onclose = fallBack;
+    });
+}
+
+async function pollSubmission(jobId, deadline) {
+    while (Date.now() < deadline) {
+        const response = await fetchWithAuth(`/api/submissions/${jobId}`);
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.detail || 'Submission not found');
+        }
+        if (data.status === 'completed' || data.status === 'failed') {
+            return data;
+        }
+        showProgress(data.status, data.completed_cases, data.total_cases);
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+    throw new Error('Timed out waiting for test results, please try again');
+}
+
+function showProgress(status, completed, total) {
+    const text = status === 'queued' ? 'Waiting in queue...' : `Running tests... ${completed}/${total}`;
+    document.getElementById('testResults').innerHTML = `<p style="text-align: center; color: var(--primary);">${text}</p>`;
+}
+
 function displayResults(data) {
     const resultsDiv = document.getElementById('testResults');
     
@@ -101,7 +182,7 @@ function displayResults(data) {
     
     data.results.forEach((result, index) => {
         const testClass = result.passed ? 'passed' : 'failed';
-        const icon = result.passed ? '✅' : '❌';
+        const icon = result.skipped ? '⏭️' : (result.passed ? '✅' : '❌');
         
         html += `
             <div class="test-case ${testClass}">
@@ -113,6 +194,7 @@ function displayResults(data) {
                 <p><strong>Expected:</strong> ${result.expected}</p>
                 <p><strong>Your Output:</strong> ${result.actual || 'No output'}</p>
                 ${result.error ? `<p style="color: var(--danger);"><strong>Error:</strong> ${result.error}</p>` : ''}
+                ${result.wall_ms != null ? `<p style="color: #6b7280; font-size: 13px;">Time: ${result.wall_ms.toFixed(1)} ms${result.cpu_ms != null ? ` (CPU ${result.cpu_ms.toFixed(1)} ms)` : ''}</p>` : ''}
             </div>
         `;
     });
@@ -32,6 +32,11 @@ async function fetchWithAuth(url, options = {}) {
         throw new Error('Authentication failed');
     }
 
+    if (response.status === 429) {
+        const retryAfter = response.headers.get('Retry-After') || 'a few';
+        throw new Error(`Too many requests, please try again in ${retryAfter} seconds`);
+    }
+
     if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
     }
@@ -39,6 +44,53 @@ async function fetchWithAuth(url, options = {}) {
     return response;
 }
 
+// POST a JSON body to a Server-Sent Events endpoint, calling onEvent(event, data) as events arrive
+async function streamWithAuth(url, body, onEvent) {
+    const response = await fetchWithAuth(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+        body: JSON.stringify(body)
+    });
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            onEvent(event, data ? JSON.parse(data) : {});
+        }
+    }
+}
+
+// Fetch a file and save it, taking the name from Content-Disposition when present
+async function downloadWithAuth(url, options = {}, fallbackName = 'download') {
+    const response = await fetchWithAuth(url, options);
+    const disposition = response.headers.get('Content-Disposition') || '';
+    const match = disposition.match(/filename="?([^"]+)"?/);
+    const blob = await response.blob();
+
+    const link = document.createElement('a');
+    link.href = URL.createObjectURL(blob);
+    link.download = match ? match[1] : fallbackName;
+    link.click();
+    setTimeout(() => URL.revokeObjectURL(link.href), 1000);
+}
+
 // Logout function
 function logout() {
     localStorage.removeItem('token');